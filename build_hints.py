@@ -0,0 +1,129 @@
+"""Precompute hint ladders for a word bank so the game never waits on Gemini for them.
+
+Usage:
+    python build_hints.py word_bank.txt [--hints 4] [--workers 4] [--rate 30]
+
+Finished ladders are appended to a progress file as they come in, so an
+interrupted run picks up where it stopped. At the end all ladders are written
+to the memory-mapped store that main.py loads at startup.
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from hint_store import HINT_STORE_PATH, write_hint_store
+from llm import configure_genai, generate_text_blocking
+from prompts import build_ladder_prompt, parse_hint_ladder
+
+DEFAULT_HINTS = 4
+DEFAULT_WORKERS = 4
+DEFAULT_RATE = 30  # Requests per minute over all workers
+DEFAULT_RETRIES = 2
+
+
+class RateLimiter:
+    """Spaces calls out evenly so all workers together stay under `per_minute`."""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute > 0 else 0.0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def wait(self):
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next)
+            self._next = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+def read_word_bank(path):
+    words = []
+    with open(path, "r", encoding="utf-8") as handle:
+        for line in handle:
+            # "word: gloss" lines; the gloss is only used by the guess engine
+            word = line.split("#", 1)[0].split(":", 1)[0].strip().lower()
+            if word and word not in words:
+                words.append(word)
+    return words
+
+
+def read_progress(path):
+    ladders = {}
+    if not os.path.exists(path):
+        return ladders
+    with open(path, "r", encoding="utf-8") as handle:
+        for line in handle:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Last line of an interrupted run may be cut off
+                continue
+            if entry.get("hints"):
+                ladders[entry["word"]] = entry["hints"]
+    return ladders
+
+
+def generate_ladder(word, count, limiter, retries):
+    prompt = build_ladder_prompt(word, count)
+    for attempt in range(retries + 1):
+        limiter.wait()
+        try:
+            hints = parse_hint_ladder(generate_text_blocking(prompt))
+        except Exception as exc:
+            print(f"[BUILD] {word}: request failed ({exc})")
+            hints = []
+        if hints:
+            return hints
+        time.sleep(2 ** attempt)
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute hint ladders for a word bank.")
+    parser.add_argument("word_bank", help="Text file with one word per line")
+    parser.add_argument("--output", default=HINT_STORE_PATH, help="Hint store to write")
+    parser.add_argument("--progress", help="Progress file (default: <output>.progress.jsonl)")
+    parser.add_argument("--hints", type=int, default=DEFAULT_HINTS, help="Hints per word")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE, help="Max requests per minute")
+    parser.add_argument("--retries", type=int, default=DEFAULT_RETRIES)
+    args = parser.parse_args()
+
+    progress_path = args.progress or args.output + ".progress.jsonl"
+    words = read_word_bank(args.word_bank)
+    ladders = read_progress(progress_path)
+    todo = [word for word in words if word not in ladders]
+    print(f"[BUILD] {len(words)} words, {len(words) - len(todo)} already done")
+
+    if todo:
+        configure_genai()
+        limiter = RateLimiter(args.rate)
+        with open(progress_path, "a", encoding="utf-8") as progress, \
+                ThreadPoolExecutor(max_workers=args.workers) as executor:
+            futures = {
+                executor.submit(generate_ladder, word, args.hints, limiter, args.retries): word
+                for word in todo
+            }
+            for done, future in enumerate(as_completed(futures), start=1):
+                word = futures[future]
+                hints = future.result()
+                if not hints:
+                    print(f"[BUILD] {word}: no usable hints, skipped")
+                    continue
+                ladders[word] = hints
+                progress.write(json.dumps({"word": word, "hints": hints}) + "\n")
+                progress.flush()
+                print(f"[BUILD] {done}/{len(todo)} {word}")
+
+    store = {word: ladders[word] for word in words if word in ladders}
+    write_hint_store(args.output, store)
+    print(f"[BUILD] Wrote {len(store)} ladders to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+import sys
+import threading
+from collections import deque
+
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred, DeferredLock, TimeoutError, inlineCallbacks
+
+CONSOLE_TIMEOUT = 120.0  # Seconds to wait for the operator to type a line
+
+
+class ConsoleInput:
+    """Reads lines from the terminal without blocking the reactor.
+
+    One daemon thread blocks on stdin and hands every line to the reactor with
+    callFromThread, so stdin/stdout keep their normal (blocking) mode. Each
+    read_line() call gets the next line typed after it; lines typed while
+    nobody is asking are dropped so a stale answer is never used.
+    """
+
+    def __init__(self, stream=None):
+        self._waiters = deque()
+        self._thread = threading.Thread(
+            target=self._read, args=(stream or sys.stdin,), name="console", daemon=True
+        )
+        self._thread.start()
+
+    def _read(self, stream):
+        for line in stream:
+            reactor.callFromThread(self._line_received, line.strip())
+
+    def _line_received(self, text):
+        if self._waiters:
+            self._waiters.popleft().callback(text)
+
+    def read_line(self, timeout=None):
+        d = Deferred(self._waiters.remove)
+        self._waiters.append(d)
+        if timeout:
+            d.addTimeout(timeout, reactor)
+        return d
+
+
+_console = None
+# One prompt on screen at a time, so a typed line always answers the prompt shown
+_prompt_lock = DeferredLock()
+
+
+def get_console():
+    """Shared ConsoleInput reading stdin (created on first use)."""
+    global _console
+    if _console is None:
+        _console = ConsoleInput()
+    return _console
+
+
+@inlineCallbacks
+def ask_line(prompt, timeout=CONSOLE_TIMEOUT, default=""):
+    """Print prompt and wait for a line on the terminal without blocking the reactor.
+
+    With several robots, prompts take turns: a prompt is only shown once the
+    previous one was answered, and `timeout` starts when it is shown. Returns
+    the stripped line, or `default` if nothing was typed in time.
+    """
+    yield _prompt_lock.acquire()
+    try:
+        print(prompt, end="", flush=True)
+        text = yield get_console().read_line(timeout)
+    except TimeoutError:
+        print(f"\n[CONSOLE] No answer after {timeout:g}s")
+        return default
+    finally:
+        _prompt_lock.release()
+    return text or default
@@ -0,0 +1,144 @@
+import re
+from collections import defaultdict, deque
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+ECHO_HISTORY_SIZE = 32  # Phrases remembered per robot
+ECHO_WINDOW = 90.0  # Seconds a spoken phrase can still come back as echo
+# Share of words that may be misheard, missing or extra and still count as echo
+ECHO_MAX_ERROR = 0.35
+# Extra words allowed around a full phrase we said (user/echo repeated the prompt)
+ECHO_MAX_EXTRA_WORDS = 4
+# Minimum length for "heard in phrase" to count as echo (so we don't ignore "yes"/"no")
+MIN_ECHO_LENGTH = 12
+# While the robot talks, heard text is echo when this share of its words is in
+# the sentence being spoken (or the one before), however short the text is
+ECHO_FRAGMENT_SHARE = 0.8
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def echo_words(text):
+    return tuple(_WORD.findall(str(text).lower().replace("'", "")))
+
+
+@lru_cache(maxsize=4096)
+def _word_cost(a, b):
+    """Substitution cost between two words: STT often mangles a word slightly."""
+    if a == b:
+        return 0.0
+    if len(a) >= 4 and len(b) >= 4 and SequenceMatcher(None, a, b).ratio() >= 0.75:
+        return 0.5
+    return 1.0
+
+
+def _substring_distance(pattern, text):
+    """Word-level edit distance between pattern and its best-matching stretch of text."""
+    previous = [0.0] * (len(text) + 1)
+    for i, word in enumerate(pattern, start=1):
+        current = [float(i)] + [0.0] * len(text)
+        for j, other in enumerate(text, start=1):
+            current[j] = min(
+                previous[j - 1] + _word_cost(word, other),
+                previous[j] + 1,
+                current[j - 1] + 1,
+            )
+        previous = current
+    return min(previous)
+
+
+def is_echo_of(heard, spoken):
+    """True if the heard words are likely the robot's own spoken words (both from echo_words)."""
+    if not heard or not spoken:
+        return False
+    if heard == spoken:
+        return True
+    # What we said is contained in what we heard
+    if len(heard) - len(spoken) <= ECHO_MAX_EXTRA_WORDS:
+        if _substring_distance(spoken, heard) <= ECHO_MAX_ERROR * len(spoken):
+            return True
+    # What we heard is part of what we said - only if it is long enough, so short
+    # valid answers like "yes" or "no" that happen to appear in a prompt still count
+    if len(" ".join(heard)) >= MIN_ECHO_LENGTH:
+        if _substring_distance(heard, spoken) <= ECHO_MAX_ERROR * len(heard):
+            return True
+    return False
+
+
+def is_fragment_of(heard, spoken):
+    """True if (almost) every heard word occurs somewhere in spoken (both from echo_words)."""
+    if not heard or not spoken:
+        return False
+    vocabulary = set(spoken)
+    inside = sum(
+        1 for word in heard
+        if word in vocabulary or any(_word_cost(word, other) < 1.0 for other in vocabulary)
+    )
+    return inside >= ECHO_FRAGMENT_SHARE * len(heard)
+
+
+class SpokenHistory:
+    """Bounded, time-stamped ring of what the robot said recently.
+
+    Phrases are split into words once when recorded, and an inverted word index
+    narrows an echo check down to the few phrases that share words with what
+    was heard before any fuzzy matching happens.
+    """
+
+    def __init__(self, size=ECHO_HISTORY_SIZE, window=ECHO_WINDOW):
+        self.size = size
+        self.window = window
+        self._entries = deque()  # (entry id, time spoken, words)
+        self._index = defaultdict(set)  # word -> entry ids
+        self._words = {}  # entry id -> words
+        self._next_id = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def record(self, text, when):
+        words = echo_words(text)
+        if not words:
+            return
+        while len(self._entries) >= self.size:
+            self._drop_oldest()
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries.append((entry_id, when, words))
+        self._words[entry_id] = words
+        for word in set(words):
+            self._index[word].add(entry_id)
+
+    def latest(self, count):
+        """Words of the `count` most recently recorded phrases, newest first."""
+        return [words for _, _, words in list(self._entries)[-count:][::-1]]
+
+    def matches(self, heard, now):
+        """True if heard text is likely an echo of something said in the last `window` seconds."""
+        while self._entries and now - self._entries[0][1] > self.window:
+            self._drop_oldest()
+        heard = echo_words(heard)
+        if not heard:
+            return False
+        shared = defaultdict(int)
+        for word in set(heard):
+            for entry_id in self._index.get(word, ()):
+                shared[entry_id] += 1
+        unique_heard = len(set(heard))
+        for entry_id, count in shared.items():
+            spoken = self._words[entry_id]
+            # Without enough words in common no fuzzy match can succeed
+            if count * 2 < min(unique_heard, len(set(spoken))):
+                continue
+            if is_echo_of(heard, spoken):
+                return True
+        return False
+
+    def _drop_oldest(self):
+        entry_id, _, words = self._entries.popleft()
+        del self._words[entry_id]
+        for word in set(words):
+            ids = self._index[word]
+            ids.discard(entry_id)
+            if not ids:
+                del self._index[word]
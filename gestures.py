@@ -1,7 +1,23 @@
+import json
 import random
+from collections import namedtuple
+from weakref import WeakKeyDictionary
 
 from alpha_mini_rug import perform_movement
-from twisted.internet.defer import inlineCallbacks
+from autobahn.twisted.util import sleep
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred, DeferredList, inlineCallbacks, succeed
+
+try:
+    import msgpack
+except ImportError:  # Only used to measure payload sizes; JSON is close enough
+    msgpack = None
+
+# Largest angle error (radians) allowed when dropping keyframes from a joint
+GESTURE_TOLERANCE = 0.02
+# A queued gesture that had to wait longer than this (seconds) for its joints
+# no longer fits what the robot is saying and is dropped
+GESTURE_MAX_WAIT = 1.0
 
 GESTURE_MAP = {
     "WAVE": "WAVE",
@@ -306,22 +322,260 @@ MOTION_FRAMES = {
 }
 
 
+CompiledGesture = namedtuple(
+    "CompiledGesture",
+    [
+        "key",
+        "times",     # keyframe times in ms
+        "joints",    # joint names, sorted
+        "table",     # one row per keyframe, one angle per joint
+        "duration",  # ms
+        "frames",    # (time, ((joint, angle), ...)) per keyframe; see movement_frames
+        "size",      # encoded payload size in bytes
+        "raw_size",  # payload size before simplification
+    ],
+)
+
+
+def _payload_size(frames):
+    """Bytes the frames take on the wire (msgpack, like the WAMP transport)."""
+    if msgpack is not None:
+        return len(msgpack.packb(frames))
+    return len(json.dumps(frames, separators=(",", ":")))
+
+
+def _simplify(points, tolerance):
+    """Ramer-Douglas-Peucker over one joint's (time, angle) keyframes.
+
+    The error of a keyframe is how far its angle is from the straight line
+    between the kept neighbours at that time, so dropping it changes the
+    motion by at most `tolerance` radians. Returns the kept points.
+    """
+    if len(points) <= 2:
+        return list(points)
+    (t0, a0), (t1, a1) = points[0], points[-1]
+    worst, worst_error = None, -1.0
+    for index in range(1, len(points) - 1):
+        time, angle = points[index]
+        expected = a0 + (a1 - a0) * (time - t0) / (t1 - t0) if t1 != t0 else a0
+        error = abs(angle - expected)
+        if error > worst_error:
+            worst, worst_error = index, error
+    if worst_error <= tolerance:
+        return [points[0], points[-1]]
+    head = _simplify(points[:worst + 1], tolerance)
+    return head[:-1] + _simplify(points[worst:], tolerance)
+
+
+def _angle_at(points, time):
+    """Angle of a joint at `time`, interpolated between its (time, angle) keyframes."""
+    if time <= points[0][0]:
+        return points[0][1]
+    for (t0, a0), (t1, a1) in zip(points, points[1:]):
+        if time <= t1:
+            return a0 + (a1 - a0) * (time - t0) / (t1 - t0) if t1 != t0 else a1
+    return points[-1][1]
+
+
+def _check_frames(key, frames):
+    # perform_movement looks up every joint of a frame in the frame before it
+    for previous, frame in zip(frames, frames[1:]):
+        missing = set(frame["data"]) - set(previous["data"])
+        if missing:
+            raise ValueError(
+                f"Gesture {key}: frame at {frame['time']} ms moves {sorted(missing)}, "
+                "which the frame before it does not set"
+            )
+
+
+def compile_gesture(key, frames, tolerance=GESTURE_TOLERANCE):
+    """Turn a frame list into an immutable time/joint table with as few keyframes as possible.
+
+    Each joint is simplified on its own: a keyframe is only needed for a joint
+    when the robot's interpolation between the remaining keyframes would be
+    more than `tolerance` radians off. A frame is dropped when no joint needs
+    it. perform_movement needs every joint in every frame, so each kept frame
+    gives each joint its angle on the simplified path, which is within
+    `tolerance` of the original. The first and last frame are always kept so
+    the timing stays the same.
+    """
+    frames = sorted(frames, key=lambda frame: frame["time"])
+    joints = tuple(sorted({joint for frame in frames for joint in frame["data"]}))
+    kept = {}
+    for joint in joints:
+        points = [
+            (frame["time"], frame["data"][joint]) for frame in frames if joint in frame["data"]
+        ]
+        kept[joint] = _simplify(points, tolerance)
+    times = tuple(sorted({time for points in kept.values() for time, _ in points}))
+    table = tuple(tuple(_angle_at(kept[joint], time) for joint in joints) for time in times)
+    frozen = tuple((time, tuple(zip(joints, row))) for time, row in zip(times, table))
+    gesture = CompiledGesture(key, times, joints, table, times[-1] if times else 0, frozen, 0, 0)
+    _check_frames(key, movement_frames(gesture))
+    return gesture._replace(
+        size=_payload_size(movement_frames(gesture)), raw_size=_payload_size(frames)
+    )
+
+
+def movement_frames(gesture):
+    """A fresh perform_movement payload for a compiled gesture.
+
+    perform_movement rewrites frame times in place to fit the robot's current
+    pose, so the shared compiled gesture must never be handed to it directly.
+    """
+    return [{"time": time, "data": dict(data)} for time, data in gesture.frames]
+
+
+# Every gesture is compiled once at import; play_gesture only looks it up
+GESTURES = {key: compile_gesture(key, build()) for key, build in MOTION_FRAMES.items()}
+
+
+def gesture_duration(key):
+    """Seconds a gesture takes, or 0.0 for an unknown gesture."""
+    gesture = GESTURES.get(key)
+    return gesture.duration / 1000.0 if gesture else 0.0
+
+
+class MotionArbiter:
+    """Keeps one robot's gestures from fighting over the same joints.
+
+    A gesture is sent right away when none of its joints are in use; the
+    joints stay busy until perform_movement has returned and the gesture's
+    duration has passed. Gestures that need busy joints wait in a queue, and a
+    newer queued gesture replaces older queued ones it fully covers, so the
+    robot is never sent movements that are already out of date. A queued
+    gesture is also dropped once it has waited longer than GESTURE_MAX_WAIT,
+    and cancelling its Deferred takes it out of the queue. Idle gestures are
+    dropped whenever anything else is moving or waiting.
+    """
+
+    def __init__(self):
+        self._busy = {}  # joint -> key of the gesture using it
+        self._queue = []  # (gesture, Deferred, time queued) waiting for joints
+        self._idle_waiters = []
+        self.sent = 0
+        self.dropped = 0
+        self.superseded = 0
+        self.stale = 0
+
+    def moving(self):
+        return bool(self._busy or self._queue)
+
+    def submit(self, session, gesture, idle=False):
+        """Deferred firing once the gesture was played, skipped or replaced.
+
+        Cancelling it before the gesture was sent removes it from the queue.
+        """
+        if idle and self.moving():
+            self.dropped += 1
+            return succeed(None)
+        joints = set(gesture.joints)
+        kept = []
+        for entry in self._queue:
+            queued, d, _ = entry
+            if joints.issuperset(queued.joints):
+                self.superseded += 1
+                print(f"[GESTURE] {queued.key} replaced by {gesture.key}")
+                d.callback(None)
+            else:
+                kept.append(entry)
+        self._queue = kept
+        done = Deferred(lambda d: self._cancel(session, d))
+        self._queue.append((gesture, done, reactor.seconds()))
+        self._drain(session)
+        return done
+
+    def when_idle(self):
+        if not self.moving():
+            return succeed(None)
+        d = Deferred()
+        self._idle_waiters.append(d)
+        return d
+
+    def stats(self):
+        return {
+            "queued": len(self._queue),
+            "busy_joints": len(self._busy),
+            "sent": self.sent,
+            "dropped": self.dropped,
+            "superseded": self.superseded,
+            "stale": self.stale,
+        }
+
+    def _cancel(self, session, done):
+        # A gesture that is already moving can't be stopped; only queued ones go
+        self._queue = [entry for entry in self._queue if entry[1] is not done]
+        self._drain(session)
+
+    def _drain(self, session):
+        # Start queued gestures in order; a gesture may not jump ahead of an
+        # earlier one that waits for the same joints
+        now = reactor.seconds()
+        claimed = set(self._busy)
+        waiting = []
+        for entry in self._queue:
+            gesture, done, queued_at = entry
+            if claimed.isdisjoint(gesture.joints):
+                if now - queued_at > GESTURE_MAX_WAIT:
+                    self.stale += 1
+                    print(f"[GESTURE] {gesture.key} waited {now - queued_at:.1f}s, skipped")
+                    done.callback(None)
+                    continue
+                self._start(session, gesture, done)
+            else:
+                waiting.append(entry)
+            claimed.update(gesture.joints)
+        self._queue = waiting
+        if not self.moving():
+            waiters, self._idle_waiters = self._idle_waiters, []
+            for d in waiters:
+                d.callback(None)
+
+    def _start(self, session, gesture, done):
+        for joint in gesture.joints:
+            self._busy[joint] = gesture.key
+        self.sent += 1
+        played = DeferredList(
+            [_send(session, gesture), sleep(gesture.duration / 1000.0)], consumeErrors=True
+        )
+        played.addCallback(self._finished, session, gesture, done)
+
+    def _finished(self, _, session, gesture, done):
+        for joint in gesture.joints:
+            if self._busy.get(joint) == gesture.key:
+                del self._busy[joint]
+        # Cancelled while moving: the Deferred has already failed with CancelledError
+        if not done.called:
+            done.callback(None)
+        self._drain(session)
+
+
+_arbiters = WeakKeyDictionary()
+
+
+def motion_arbiter(session):
+    arbiter = _arbiters.get(session)
+    if arbiter is None:
+        arbiter = _arbiters[session] = MotionArbiter()
+    return arbiter
+
+
 @inlineCallbacks
-def play_gesture(session, key):
-    if key not in MOTION_FRAMES:
-        print(f"[GESTURE] Unknown gesture: {key}")
-        return
-    frames = MOTION_FRAMES[key]()
-    print(f"[GESTURE] {key} ({len(frames)} frames)")
+def _send(session, gesture):
+    frames = movement_frames(gesture)
+    print(f"[GESTURE] {gesture.key} ({len(frames)} frames, {gesture.size} of {gesture.raw_size} bytes)")
     try:
         yield perform_movement(session, frames)
     except Exception as exc:
         print(f"[GESTURE] perform_movement failed: {exc}")
 
 
-@inlineCallbacks
-def play_idle(session):
-    yield play_gesture(session, random.choice(IDLE_GESTURES))
+def play_gesture(session, key, idle=False):
+    gesture = GESTURES.get(key)
+    if gesture is None:
+        print(f"[GESTURE] Unknown gesture: {key}")
+        return succeed(None)
+    return motion_arbiter(session).submit(session, gesture, idle)
 
 
 @inlineCallbacks
@@ -348,7 +602,8 @@ def play_wave(session):
 
 @inlineCallbacks
 def play_stand(session):
-    # Use blockly behavior for proper standing
+    # Use blockly behavior for proper standing, once no gesture is moving the joints
+    yield motion_arbiter(session).when_idle()
     try:
         yield session.call("rom.optional.behavior.play", name="BlocklyStand")
     except Exception as exc:
@@ -0,0 +1,114 @@
+import os
+import re
+
+import numpy as np
+
+WORD_BANK_PATH = os.path.join(os.path.dirname(__file__), "word_bank.txt")
+# Softmax temperature over cosine scores; lower means more decisive
+LOCAL_GUESS_TEMPERATURE = 0.08
+# Score of "some word not in the bank", so weak matches don't look confident
+LOCAL_GUESS_FLOOR = 0.2
+
+_TOKEN = re.compile(r"[a-z]+")
+_STOPWORDS = {
+    "the", "and", "you", "your", "its", "are", "was", "with", "this", "that",
+    "for", "from", "can", "has", "have", "they", "them", "what", "when", "where",
+    "very", "thing", "something", "like", "use", "used", "not", "but", "there",
+    "some", "lot", "lots", "one", "also", "get", "make", "people",
+}
+
+
+def _stem(token):
+    for suffix in ("ing", "es", "ed", "s"):
+        if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+            return token[:-len(suffix)]
+    return token
+
+
+def tokenize(text):
+    return [
+        _stem(token)
+        for token in _TOKEN.findall(str(text).lower())
+        if len(token) > 2 and token not in _STOPWORDS
+    ]
+
+
+def read_glossary(path=WORD_BANK_PATH):
+    """Read (word, gloss) pairs from a word bank with "word: gloss" lines."""
+    entries = []
+    with open(path, "r", encoding="utf-8") as handle:
+        for line in handle:
+            line = line.split("#", 1)[0].strip()
+            if not line:
+                continue
+            word, _, gloss = line.partition(":")
+            entries.append((word.strip().lower(), gloss.strip()))
+    return entries
+
+
+class GuessEngine:
+    """TF-IDF matcher from director hints to the words of a word bank.
+
+    The bank is turned into an L2-normalised (words x terms) matrix once, so
+    ranking every candidate is a single matrix-vector product.
+    """
+
+    def __init__(self, entries):
+        self.words = [word for word, _ in entries]
+        documents = [tokenize(f"{word} {word} {gloss}") for word, gloss in entries]
+        self.vocabulary = {
+            term: index
+            for index, term in enumerate(sorted({term for doc in documents for term in doc}))
+        }
+        counts = np.zeros((len(documents), len(self.vocabulary)), dtype=np.float32)
+        for row, doc in enumerate(documents):
+            for term in doc:
+                counts[row, self.vocabulary[term]] += 1
+        document_frequency = np.count_nonzero(counts, axis=0)
+        self.idf = (np.log((1 + len(documents)) / (1 + document_frequency)) + 1).astype(np.float32)
+        matrix = np.log1p(counts) * self.idf
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        self.matrix = matrix / np.maximum(norms, 1e-9)
+
+    def rank(self, descriptions, rejected=(), count=5):
+        """Return the `count` best (word, confidence) pairs for the hints, best first."""
+        if isinstance(descriptions, str):
+            descriptions = [descriptions]
+        query = np.zeros(len(self.vocabulary), dtype=np.float32)
+        for description in descriptions:
+            for term in tokenize(description):
+                index = self.vocabulary.get(term)
+                if index is not None:
+                    query[index] += 1
+        if not query.any():
+            return []
+        query = np.log1p(query) * self.idf
+        query /= np.linalg.norm(query)
+        scores = self.matrix @ query
+        for index, word in enumerate(self.words):
+            if word in rejected:
+                scores[index] = -np.inf
+        # Softmax over the bank plus one "not in the bank" outcome
+        logits = np.append(scores, LOCAL_GUESS_FLOOR) / LOCAL_GUESS_TEMPERATURE
+        weights = np.exp(logits - logits.max())
+        confidences = weights[:-1] / weights.sum()
+        best = np.argsort(-confidences)[:count]
+        return [
+            (self.words[index], float(confidences[index]))
+            for index in best
+            if scores[index] > 0
+        ]
+
+
+_engine = None
+_engine_loaded = False
+
+
+def get_guess_engine():
+    """Shared GuessEngine built from the word bank, or None if there is no word bank."""
+    global _engine, _engine_loaded
+    if not _engine_loaded:
+        _engine_loaded = True
+        if os.path.exists(WORD_BANK_PATH):
+            _engine = GuessEngine(read_glossary())
+    return _engine
@@ -0,0 +1,127 @@
+import os
+import random
+import sqlite3
+import time
+
+HINT_CACHE_PATH = os.path.join(os.path.dirname(__file__), "hint_cache.sqlite3")
+HINT_CACHE_MAX_LADDERS = 200  # Size cap over all words
+HINT_CACHE_TTL = 14 * 24 * 3600  # Seconds before a ladder is regenerated
+HINT_CACHE_VARIANTS = 3  # Ladders kept per word; one is picked at random for variety
+
+
+class HintCache:
+    """Generated hint ladders stored in SQLite, keyed by target word and hint index.
+
+    Every word can have a few ladder variants. get_ladder() picks one of them at
+    random so repeated rounds don't always sound the same. Ladders older than the
+    TTL are dropped, and when there are more than max_ladders in total the least
+    recently used ones are evicted.
+    """
+
+    def __init__(
+        self,
+        path=HINT_CACHE_PATH,
+        max_ladders=HINT_CACHE_MAX_LADDERS,
+        ttl_seconds=HINT_CACHE_TTL,
+        variants=HINT_CACHE_VARIANTS,
+    ):
+        self.max_ladders = max_ladders
+        self.ttl_seconds = ttl_seconds
+        self.variants = variants
+        self._db = sqlite3.connect(path)
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS hints ("
+            " word TEXT NOT NULL,"
+            " variant INTEGER NOT NULL,"
+            " hint_index INTEGER NOT NULL,"
+            " text TEXT NOT NULL,"
+            " created REAL NOT NULL,"
+            " last_used REAL NOT NULL,"
+            " PRIMARY KEY (word, variant, hint_index))"
+        )
+        self._db.commit()
+
+    def variant_count(self, word):
+        self._expire()
+        row = self._db.execute(
+            "SELECT COUNT(DISTINCT variant) FROM hints WHERE word = ?",
+            (word.lower(),),
+        ).fetchone()
+        return row[0]
+
+    def get_ladder(self, word):
+        """Return the hints of a random cached ladder for word, or None."""
+        word = word.lower()
+        self._expire()
+        variants = [
+            row[0] for row in self._db.execute(
+                "SELECT DISTINCT variant FROM hints WHERE word = ?", (word,)
+            )
+        ]
+        if not variants:
+            return None
+        variant = random.choice(variants)
+        hints = [
+            row[0] for row in self._db.execute(
+                "SELECT text FROM hints WHERE word = ? AND variant = ? ORDER BY hint_index",
+                (word, variant),
+            )
+        ]
+        with self._db:
+            self._db.execute(
+                "UPDATE hints SET last_used = ? WHERE word = ? AND variant = ?",
+                (time.time(), word, variant),
+            )
+        return hints
+
+    def put_ladder(self, word, hints):
+        hints = [hint for hint in hints if hint]
+        if not hints:
+            return
+        word = word.lower()
+        now = time.time()
+        with self._db:
+            row = self._db.execute(
+                "SELECT MAX(variant) FROM hints WHERE word = ?", (word,)
+            ).fetchone()
+            variant = 0 if row[0] is None else row[0] + 1
+            self._db.executemany(
+                "INSERT INTO hints VALUES (?, ?, ?, ?, ?, ?)",
+                [(word, variant, index, hint, now, now) for index, hint in enumerate(hints)],
+            )
+            # Keep only the newest variants of this word
+            self._db.execute(
+                "DELETE FROM hints WHERE word = ? AND variant NOT IN ("
+                " SELECT variant FROM hints WHERE word = ?"
+                " GROUP BY variant ORDER BY MAX(created) DESC LIMIT ?)",
+                (word, word, self.variants),
+            )
+            # Global size cap: evict least recently used ladders
+            stale = self._db.execute(
+                "SELECT word, variant FROM hints GROUP BY word, variant"
+                " ORDER BY MAX(last_used) DESC LIMIT -1 OFFSET ?",
+                (self.max_ladders,),
+            ).fetchall()
+            self._db.executemany(
+                "DELETE FROM hints WHERE word = ? AND variant = ?", stale
+            )
+
+    def close(self):
+        self._db.close()
+
+    def _expire(self):
+        with self._db:
+            self._db.execute(
+                "DELETE FROM hints WHERE created < ?", (time.time() - self.ttl_seconds,)
+            )
+
+
+_cache = None
+
+
+def get_hint_cache():
+    """Shared HintCache for the whole process, opened on first use."""
+    global _cache
+    if _cache is None:
+        _cache = HintCache()
+    return _cache
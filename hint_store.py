@@ -0,0 +1,113 @@
+import mmap
+import os
+import struct
+
+HINT_STORE_PATH = os.path.join(os.path.dirname(__file__), "hints.bin")
+
+# File layout (all integers little-endian uint32):
+#   header:  magic, word count
+#   index:   one (key offset, key length, ladder offset, hint count) entry per
+#            word, sorted by the UTF-8 bytes of the word
+#   data:    keys, then every ladder as (length, UTF-8 bytes) per hint
+# Offsets are absolute, so lookups read straight out of the memory map.
+_MAGIC = b"HNT1"
+_HEADER = struct.Struct("<4sI")
+_ENTRY = struct.Struct("<IIII")
+_LENGTH = struct.Struct("<I")
+
+
+def write_hint_store(path, ladders):
+    """Write {word: [hint, ...]} to path in the compact store format."""
+    items = sorted(
+        (word.lower().encode("utf-8"), [hint.encode("utf-8") for hint in hints])
+        for word, hints in ladders.items()
+        if hints
+    )
+    data_start = _HEADER.size + _ENTRY.size * len(items)
+    index = []
+    data = bytearray()
+    for key, hints in items:
+        key_offset = data_start + len(data)
+        data += key
+        ladder_offset = data_start + len(data)
+        for hint in hints:
+            data += _LENGTH.pack(len(hint))
+            data += hint
+        index.append(_ENTRY.pack(key_offset, len(key), ladder_offset, len(hints)))
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as handle:
+        handle.write(_HEADER.pack(_MAGIC, len(items)))
+        handle.writelines(index)
+        handle.write(data)
+    os.replace(tmp_path, path)
+
+
+class HintStore:
+    """Read-only, memory-mapped hint ladders built by build_hints.py."""
+
+    def __init__(self, path=HINT_STORE_PATH):
+        with open(path, "rb") as handle:
+            self._map = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self._count = _HEADER.unpack_from(self._map, 0)
+        if magic != _MAGIC:
+            self._map.close()
+            raise ValueError(f"{path} is not a hint store")
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, word):
+        return self._find(word) is not None
+
+    def get_ladder(self, word):
+        """Return the list of hints for word, or None if it is not in the store."""
+        entry = self._find(word)
+        if entry is None:
+            return None
+        _, _, offset, count = entry
+        hints = []
+        for _ in range(count):
+            (length,) = _LENGTH.unpack_from(self._map, offset)
+            offset += _LENGTH.size
+            hints.append(self._map[offset:offset + length].decode("utf-8"))
+            offset += length
+        return hints
+
+    def close(self):
+        self._map.close()
+
+    def _entry(self, position):
+        return _ENTRY.unpack_from(self._map, _HEADER.size + position * _ENTRY.size)
+
+    def _find(self, word):
+        key = word.lower().encode("utf-8")
+        low, high = 0, self._count
+        while low < high:
+            middle = (low + high) // 2
+            entry = self._entry(middle)
+            candidate = self._map[entry[0]:entry[0] + entry[1]]
+            if candidate == key:
+                return entry
+            if candidate < key:
+                low = middle + 1
+            else:
+                high = middle
+        return None
+
+
+_store = None
+_store_loaded = False
+
+
+def get_hint_store():
+    """Shared HintStore for the whole process, or None if no store was built."""
+    global _store, _store_loaded
+    if not _store_loaded:
+        _store_loaded = True
+        if os.path.exists(HINT_STORE_PATH):
+            try:
+                _store = HintStore()
+                print(f"[HINTS] Loaded {len(_store)} prebuilt hint ladders")
+            except (OSError, ValueError, struct.error) as exc:
+                print(f"[HINTS] Could not load hint store: {exc}")
+    return _store
@@ -0,0 +1,365 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+
+from autobahn.twisted.util import sleep
+from twisted.internet import reactor
+from twisted.internet.defer import (
+    CancelledError,
+    Deferred,
+    TimeoutError,
+    fail,
+    inlineCallbacks,
+)
+from twisted.internet.threads import deferToThreadPool
+from twisted.python.failure import Failure
+from twisted.python.threadpool import ThreadPool
+
+MODEL_NAME = "gemini-2.5-flash"
+# A handful of workers per robot is enough: a game never has more than a couple
+# of requests in flight, and a bounded pool keeps a stuck API from piling up threads.
+LLM_MIN_THREADS = 1
+LLM_MAX_THREADS = 4  # Per robot; see set_robot_count
+LLM_TIMEOUT = 20.0  # Deadline per attempt once a worker runs it, in seconds
+LLM_RETRIES = 2
+LLM_BACKOFF = 0.5  # First retry delay; doubles on every retry
+LLM_BUDGET = 30.0  # Overall deadline for a request, retries and backoff included
+# Send a duplicate request once an attempt is slower than this share of recent ones
+LLM_HEDGE_PERCENTILE = 0.9
+LLM_HEDGE_MIN_SAMPLES = 8
+# Stop calling the API for a while after this many failures in a row
+LLM_BREAKER_FAILURES = 3
+LLM_BREAKER_COOLDOWN = 30.0
+LLM_WARM_UP_PROMPT = "Reply with the single word: ready"
+
+_pool = None
+_max_threads = LLM_MAX_THREADS
+_latencies = deque(maxlen=50)
+# google.generativeai takes seconds to import, so it is loaded on first use
+# (off the reactor, see preload_genai) and all requests share one model client
+_model = None
+_genai_lock = threading.Lock()
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling the API while the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Fails fast after repeated API failures so callers switch to cached or local answers.
+
+    After `cooldown` seconds requests are let through again; one more failure
+    opens the circuit for another cooldown, a success closes it.
+    """
+
+    def __init__(self, max_failures=LLM_BREAKER_FAILURES, cooldown=LLM_BREAKER_COOLDOWN):
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at = None
+
+    def check(self):
+        if self.opened_at is not None and time.monotonic() - self.opened_at < self.cooldown:
+            raise CircuitOpenError("LLM circuit is open, not calling the API")
+
+    def success(self):
+        if self.opened_at is not None:
+            print("[LLM] API is back, closing circuit")
+        self.failures = 0
+        self.opened_at = None
+
+    def failure(self):
+        self.failures += 1
+        if self.failures >= self.max_failures:
+            if self.opened_at is None:
+                print(f"[LLM] {self.failures} failures in a row, opening circuit for {self.cooldown:.0f}s")
+            self.opened_at = time.monotonic()
+
+    def is_open(self):
+        try:
+            self.check()
+        except CircuitOpenError:
+            return True
+        return False
+
+
+breaker = CircuitBreaker()
+
+
+def load_api_key():
+    env_key = os.getenv("GOOGLE_API_KEY")
+    if env_key:
+        return env_key
+
+    secrets_path = os.path.join(os.path.dirname(__file__), "secrets.json")
+    if os.path.exists(secrets_path):
+        try:
+            with open(secrets_path, "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+                return data.get("GOOGLE_API_KEY")
+        except (OSError, json.JSONDecodeError):
+            return None
+    return None
+
+
+def configure_genai():
+    """Import and configure the Gemini SDK and create the shared model; safe to call again."""
+    global _model
+    with _genai_lock:
+        if _model is not None:
+            return
+        api_key = load_api_key()
+        if not api_key:
+            raise RuntimeError(
+                "Missing GOOGLE_API_KEY. Set it as an environment variable or "
+                "add it to secrets.json."
+            )
+        import google.generativeai as genai
+
+        genai.configure(api_key=api_key)
+        _model = genai.GenerativeModel(MODEL_NAME)
+
+
+def get_model():
+    if _model is None:
+        configure_genai()
+    return _model
+
+
+def set_robot_count(count):
+    """Size the shared LLM pool for `count` robots in this process."""
+    global _max_threads
+    _max_threads = LLM_MAX_THREADS * max(1, count)
+    if _pool is not None:
+        _pool.adjustPoolsize(LLM_MIN_THREADS, _max_threads)
+
+
+def _get_pool():
+    global _pool
+    if _pool is None:
+        _pool = ThreadPool(LLM_MIN_THREADS, _max_threads, name="llm")
+        _pool.start()
+        reactor.addSystemEventTrigger("during", "shutdown", _pool.stop)
+    return _pool
+
+
+def _run_on_pool(timeout, function, *args):
+    """Run function on the LLM pool; returns a Deferred with its result.
+
+    The deadline starts when a worker picks the call up, not when it is
+    submitted, so time spent queued behind other robots' requests never turns
+    into a TimeoutError (and never opens the circuit breaker).
+    """
+    done = Deferred()
+    timer = []
+
+    def _expire():
+        if not done.called:
+            done.errback(TimeoutError(f"LLM request took longer than {timeout:g}s"))
+
+    def _start():
+        if timeout and not done.called:
+            timer.append(reactor.callLater(timeout, _expire))
+
+    def _run():
+        reactor.callFromThread(_start)
+        return function(*args)
+
+    def _finish(result):
+        for call in timer:
+            if call.active():
+                call.cancel()
+        if not done.called:
+            if isinstance(result, Failure):
+                done.errback(result)
+            else:
+                done.callback(result)
+
+    deferToThreadPool(reactor, _get_pool(), _run).addBoth(_finish)
+    return done
+
+
+def preload_genai():
+    """Configure Gemini on the LLM pool, then warm the connection up in the background.
+
+    Returns a Deferred firing once the SDK is ready; the warm-up request is
+    not waited for.
+    """
+    d = deferToThreadPool(reactor, _get_pool(), configure_genai)
+    d.addCallback(lambda _: warm_up())
+    d.addCallback(lambda _: None)
+    return d
+
+
+def warm_up(timeout=LLM_TIMEOUT):
+    """Send one tiny request so the first real one finds an open connection.
+
+    Failures are only logged and do not count towards the circuit breaker.
+    """
+    started = time.monotonic()
+
+    def _report(result):
+        if isinstance(result, Failure):
+            print(f"[LLM] Warm-up failed: {result.getErrorMessage()}")
+        else:
+            print(f"[LLM] Warm-up done in {time.monotonic() - started:.2f}s")
+
+    d = _run_on_pool(timeout, generate_text_blocking, LLM_WARM_UP_PROMPT)
+    d.addBoth(_report)
+    return d
+
+
+def generate_text_blocking(prompt):
+    """Run one Gemini request on the calling thread (for offline tools, not the reactor)."""
+    response = get_model().generate_content(prompt)
+    return response.text
+
+
+def _attempt(prompt, timeout):
+    started = time.monotonic()
+
+    def _record(text):
+        _latencies.append(time.monotonic() - started)
+        return text
+
+    d = _run_on_pool(timeout, generate_text_blocking, prompt)
+    d.addCallback(_record)
+    return d
+
+
+def _hedge_delay():
+    if len(_latencies) < LLM_HEDGE_MIN_SAMPLES:
+        return None
+    ordered = sorted(_latencies)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * LLM_HEDGE_PERCENTILE))]
+
+
+def _hedged_attempt(prompt, timeout):
+    """One attempt, plus a duplicate request if the first one is unusually slow.
+
+    Whichever request answers first wins; the other one is cancelled.
+    """
+    delay = _hedge_delay()
+    first = _attempt(prompt, timeout)
+    if delay is None or (timeout and delay >= timeout):
+        return first
+    pending = [first]
+    failed = []
+
+    def _cancel(_):
+        for d in pending:
+            d.cancel()
+
+    result = Deferred(_cancel)
+
+    def _won(text):
+        if not result.called:
+            result.callback(text)
+            if hedge_call.active():
+                hedge_call.cancel()
+            for d in pending:
+                d.cancel()
+
+    def _lost(failure):
+        failed.append(failure)
+        if not result.called and len(failed) == len(pending):
+            if hedge_call.active():
+                hedge_call.cancel()
+            result.errback(failure)
+
+    def _hedge():
+        print(f"[LLM] Request slower than {delay:.1f}s, sending a hedged duplicate")
+        d = _attempt(prompt, timeout - delay if timeout else None)
+        pending.append(d)
+        d.addCallbacks(_won, _lost)
+
+    hedge_call = reactor.callLater(delay, _hedge)
+    first.addCallbacks(_won, _lost)
+    return result
+
+
+@inlineCallbacks
+def generate_text(prompt, timeout=LLM_TIMEOUT, retries=LLM_RETRIES, budget=LLM_BUDGET):
+    """Run one Gemini request on the LLM worker pool.
+
+    Returns a Deferred firing with the response text. Every attempt has a
+    deadline of `timeout` seconds and is hedged with a duplicate request when it
+    is slower than most recent ones. Failed attempts are retried with
+    exponential backoff. The whole call, retries and backoff included, fails
+    with TimeoutError after `budget` seconds; each attempt only gets what is
+    left of it. While the circuit breaker is open the Deferred fails right away
+    with CircuitOpenError. Cancelling (or timing out) only drops the result;
+    worker threads finish their requests on their own.
+    """
+    deadline = time.monotonic() + budget
+    delay = LLM_BACKOFF
+    for attempt in range(retries + 1):
+        breaker.check()
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise TimeoutError(f"LLM request took longer than {budget:g}s")
+        try:
+            text = yield _hedged_attempt(prompt, min(timeout, remaining) if timeout else remaining)
+        except CancelledError:
+            raise
+        except Exception as exc:
+            breaker.failure()
+            if attempt == retries or breaker.is_open():
+                raise
+            if deadline - time.monotonic() <= delay:
+                # Backing off would use up the budget; fail now instead of late
+                raise
+            print(f"[LLM] Request failed ({exc!r}), retrying in {delay:.1f}s")
+            yield sleep(delay)
+            delay *= 2
+            continue
+        breaker.success()
+        return text
+
+
+def stream_text(prompt, on_chunk, timeout=LLM_TIMEOUT):
+    """Run one streaming Gemini request on the LLM worker pool.
+
+    on_chunk(text) is called on the reactor thread for every streamed chunk,
+    in order, as soon as it arrives. Returns a Deferred firing with the full
+    text once the stream ends. After a timeout or cancel, no further chunks are
+    delivered and the worker stops reading the stream at the next chunk.
+    Streams are not retried (part of the text may already be used), but they
+    count towards the circuit breaker.
+    """
+    try:
+        breaker.check()
+    except CircuitOpenError:
+        return fail()
+    stopped = threading.Event()
+
+    def _deliver(text):
+        if not stopped.is_set():
+            on_chunk(text)
+
+    def _stream():
+        parts = []
+        for chunk in get_model().generate_content(prompt, stream=True):
+            if stopped.is_set():
+                break
+            text = chunk.text
+            if text:
+                parts.append(text)
+                reactor.callFromThread(_deliver, text)
+        return "".join(parts)
+
+    def _done(text):
+        breaker.success()
+        return text
+
+    def _stop(failure):
+        stopped.set()
+        if not failure.check(CancelledError):
+            breaker.failure()
+        return failure
+
+    d = _run_on_pool(timeout, _stream)
+    d.addCallbacks(_done, _stop)
+    return d
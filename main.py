@@ -1,17 +1,41 @@
-import json
-import os
 import random
 
-import google.generativeai as genai
-
-from autobahn.twisted.component import Component, run
 from twisted.internet.defer import inlineCallbacks
 
-from stt import RobotSTT, listen_from_robot, start_robot_mic, stop_robot_mic
-from tts import say_text, say_text_with_prompt_gesture, speak_with_gestures
+from console import ask_line
+from guess_engine import get_guess_engine
+from hint_cache import get_hint_cache
+from hint_store import get_hint_store
+from llm import generate_text, preload_genai, stream_text
+from prompts import (
+    build_description_prompt,
+    build_guess_prompt,
+    build_ladder_prompt,
+    clean_description,
+    parse_guess_candidates,
+    parse_hint_ladder,
+)
+from sessions import SessionManager, read_realms
+from startup import StartupStep, run_startup
+from stt import (
+    RobotSTT,
+    listen_for_barge_in,
+    listen_from_robot,
+    start_robot_mic,
+    stop_robot_mic,
+)
+from tts import (
+    BargeIn,
+    ScriptStream,
+    gesture_timeline,
+    say_text,
+    say_text_with_prompt_gesture,
+    speak_stream,
+    speak_with_gestures,
+)
 
 from gestures import (
-    GESTURE_MAP,
+    motion_arbiter,
     play_correct_guess,
     play_no_hear,
     play_stand,
@@ -26,61 +50,209 @@ TARGET_WORDS = [
     "piano",
     "rainbow",
 ]
-LAST_WORD = None
+DIRECTOR_WORD_TIMEOUT = 120.0  # Seconds to type the word before falling back to a default
+# Ask for the whole hint ladder of a round in one request instead of one per hint
+BATCH_HINTS = True
+# How many ranked guesses to ask for at once in director mode
+GUESS_CANDIDATES = 5
+GUESS_CONFIDENCE = 0.55
+GUESS_BUDGET = 15.0  # The player is waiting; give up on a guess request sooner than the default
+# Words that don't change what a hint is about
+_HINT_FILLER_WORDS = {
+    "a", "an", "the", "it", "its", "is", "are", "was", "and", "or", "of", "to",
+    "in", "on", "with", "you", "i", "this", "that", "very", "thing", "something",
+    "um", "uh", "like", "can", "be", "has", "have",
+}
 
 
-def load_api_key():
-    env_key = os.getenv("GOOGLE_API_KEY")
-    if env_key:
-        return env_key
+@inlineCallbacks
+def get_robot_hint_ladder(target_word, count):
+    """Generate `count` escalating hints for target_word in a single request.
+
+    Runs on the LLM worker pool; returns a Deferred firing with the list of hints.
+    """
+    text = yield generate_text(build_ladder_prompt(target_word, count))
+    return parse_hint_ladder(text)
+
+
+def stream_robot_description(target_word, previous_descriptions=None):
+    """Generate a description of target_word, streamed so it can be spoken while generating.
+
+    If previous_descriptions is given, the hint is a NEW one that does not repeat them.
+
+    Returns (stream, done): stream is a ScriptStream that receives sentences and
+    gesture tags while the model is still generating, done is a Deferred firing
+    with the full cleaned hint. The stream is closed when generation ends or fails.
+    """
+    stream = ScriptStream()
+    prompt = build_description_prompt(target_word, previous_descriptions)
+    done = stream_text(prompt, stream.feed)
+
+    def _close(result):
+        stream.close()
+        return result
+
+    done.addBoth(_close)
+    done.addCallback(clean_description)
+    return stream, done
+
+
+class HintPrefetcher:
+    """Supplies guesser hints for one round, generating them ahead of time.
+
+    A prebuilt ladder from the hint store (see build_hints.py) or the hint cache
+    is used first, so those words cost no request at all. In batched mode the
+    whole hint ladder is requested once when the round starts and every hint is
+    served from memory. Otherwise (or if the ladder request fails or runs out)
+    hints are streamed one at a time, and as soon as a hint has been generated
+    the following one starts streaming in the background. New hints end up in
+    the cache.
+    """
+
+    def __init__(self, target_word, max_hints, batched=BATCH_HINTS, cache=None, store=None):
+        self.target_word = target_word
+        self.max_hints = max_hints
+        self.batched = batched
+        self.cache = cache
+        self.descriptions = []  # Remember what we already said for extra hints
+        self.ladder = None
+        self._ladder_hints = None
+        self._pending = None
+        self._stored = False
+        self._discarded = False
+        self._unfinished = None  # Stream of a hint the player cut off
+        prebuilt = store.get_ladder(target_word) if store is not None else None
+        cached = None
+        if not prebuilt and cache is not None:
+            cached = cache.get_ladder(target_word)
+        if prebuilt:
+            print(f"[HINTS] Using prebuilt hints for {target_word!r}")
+            self.batched = True
+            self._ladder_hints = prebuilt
+            self._stored = True
+        elif cached:
+            print(f"[CACHE] Using cached hints for {target_word!r}")
+            self.batched = True
+            self._ladder_hints = cached
+            self._stored = True
+            self._refill_cache()
+
+    def start(self):
+        if self._discarded:
+            return
+        if self.batched:
+            if self.ladder is None and self._ladder_hints is None:
+                self.ladder = get_robot_hint_ladder(self.target_word, self.max_hints)
+            return
+        if self._pending is not None or len(self.descriptions) >= self.max_hints:
+            return
+        self._pending = stream_robot_description(
+            self.target_word, previous_descriptions=list(self.descriptions)
+        )
 
-    secrets_path = os.path.join(os.path.dirname(__file__), "secrets.json")
-    if os.path.exists(secrets_path):
-        try:
-            with open(secrets_path, "r", encoding="utf-8") as handle:
-                data = json.load(handle)
-                return data.get("GOOGLE_API_KEY")
-        except (OSError, json.JSONDecodeError):
-            return None
-    return None
+    @inlineCallbacks
+    def speak_next(self, session, barge_in=None):
+        """Speak the next hint and return its full text.
+
+        If barge_in fires, speaking stops right away (a streamed hint keeps
+        generating in the background and is still remembered).
+        """
+        if self.batched:
+            script = yield self._next_from_ladder()
+            if script:
+                self.descriptions.append(script)
+                yield speak_with_gestures(session, script, barge_in)
+                return script
+            # Ladder failed or ran out: stream one hint at a time from here on
+            self.batched = False
+        pending, self._pending = self._pending, None
+        for _ in range(2):
+            if pending is None:
+                pending = stream_robot_description(
+                    self.target_word, previous_descriptions=list(self.descriptions)
+                )
+            stream, done = pending
+            pending = None
+            done.addCallback(self._generated)
+            yield speak_stream(session, stream, barge_in)
+            if barge_in is not None and barge_in.fired:
+                self._unfinished = done
+                done.addErrback(self._stream_lost)
+                return ""
+            try:
+                script = yield done
+                return script
+            except Exception as exc:
+                if stream.emitted:
+                    # Part of the hint was already spoken; keep going with what we have
+                    print(f"[LLM] Hint stream broke off: {exc}")
+                    return ""
+                print(f"[LLM] Hint generation failed: {exc}")
+        yield say_text(
+            session,
+            "Sorry, I cannot think of another hint right now.",
+            gesture="SHRUG"
+        )
+        return ""
 
+    @inlineCallbacks
+    def _next_from_ladder(self):
+        if self._ladder_hints is None:
+            self.start()
+            try:
+                self._ladder_hints = yield self.ladder
+            except Exception as exc:
+                print(f"[LLM] Hint ladder failed: {exc}")
+                self._ladder_hints = []
+            if self._ladder_hints and self.cache is not None:
+                self.cache.put_ladder(self.target_word, self._ladder_hints)
+                self._stored = True
+        index = len(self.descriptions)
+        if index < len(self._ladder_hints):
+            return self._ladder_hints[index]
+        return None
 
-def configure_genai():
-    api_key = load_api_key()
-    if not api_key:
-        raise RuntimeError(
-            "Missing GOOGLE_API_KEY. Set it as an environment variable or "
-            "add it to secrets.json."
-        )
-    genai.configure(api_key=api_key)
-
-
-def get_robot_description(target_word, previous_descriptions=None):
-    """Generate a description of target_word. If previous_descriptions is given, give a NEW hint that does not repeat them."""
-    model = genai.GenerativeModel("gemini-2.5-flash")
-    available_actions = ", ".join([f"[{k}]" for k in GESTURE_MAP.keys()])
-    prompt = (
-        "You are a social robot playing a guessing game.\n"
-        f'Target word: "{target_word}".\n'
-    )
-    if previous_descriptions:
-        prompt += (
-            "You already said these hints (do NOT repeat or rephrase them):\n"
-            + "\n".join(f"- {d}" for d in previous_descriptions)
-            + "\nGive ONE new, different hint. "
-        )
-    else:
-        prompt += "1. Describe it without saying the word.\n"
-    prompt += (
-        f"2. Use gesture tags like {available_actions}.\n"
-        "3. Keep it very short.\n"
-    )
-    response = model.generate_content(prompt)
-    text = response.text.strip()
-    text = text.replace("```", "")
-    text = text.replace("\n", " ")
-    text = " ".join(text.split())
-    return text
+    def _generated(self, script):
+        self.descriptions.append(script)
+        if self._discarded:
+            # A cut-off hint finished after the round was over; only keep it
+            self._save_streamed()
+        else:
+            self.start()
+        return script
+
+    def _stream_lost(self, failure):
+        if self._discarded:
+            self._save_streamed()
+
+    def _save_streamed(self):
+        if self.cache is not None and not self._stored and self.descriptions:
+            # Hints were streamed one by one: keep them as a ladder for next time
+            self.cache.put_ladder(self.target_word, self.descriptions)
+            self._stored = True
+
+    def _refill_cache(self):
+        """Generate another ladder in the background until the word has enough variants."""
+        if self.cache.variant_count(self.target_word) >= self.cache.variants:
+            return
+        word, cache = self.target_word, self.cache
+        d = get_robot_hint_ladder(word, self.max_hints)
+        d.addCallback(lambda hints: cache.put_ladder(word, hints))
+        d.addErrback(lambda failure: print(f"[CACHE] Refill failed: {failure.getErrorMessage()}"))
+
+    def discard(self):
+        self._discarded = True
+        # A cut-off hint that is still generating is saved once it is complete
+        if self._unfinished is None or self._unfinished.called:
+            self._save_streamed()
+        if self.ladder is not None and not self.ladder.called:
+            self.ladder.addErrback(lambda failure: None)
+            self.ladder.cancel()
+        pending, self._pending = self._pending, None
+        if pending is not None:
+            stream, done = pending
+            done.addErrback(lambda failure: None)
+            done.cancel()
 
 
 def wants_more_hint(text):
@@ -149,77 +321,152 @@ def parse_replay_choice(text):
 
 
 @inlineCallbacks
-def goodbye_and_leave(session):
+def goodbye_and_leave(session, robot_stt=None):
     yield say_text(session, "Okay, thanks for playing.", gesture="WAVE")
-    yield stop_robot_mic(session)
+    yield stop_robot_mic(session, robot_stt)
+    # Let the wave finish before the connection goes away
+    yield gesture_timeline(session).when_idle()
+    print(f"[GESTURE] Motion stats: {motion_arbiter(session).stats()}")
     session.leave()
 
 
 @inlineCallbacks
 def listen_text(session, robot_stt, ignore_phrases=None):
-    """Listen for user speech. ignore_phrases: list of strings we just said (TTS) to ignore if mic picks them up."""
+    """Listen for user speech. Everything the robot said recently is ignored automatically;
+    ignore_phrases: extra strings to ignore if the mic picks them up."""
     text = yield listen_from_robot(session, robot_stt, ignore_phrases=ignore_phrases)
     return normalize_text(text)
 
 
-def get_robot_guess(descriptions):
-    """Guess the word from one or more descriptions. descriptions can be a string or a list of strings (all hints so far)."""
-    model = genai.GenerativeModel("gemini-2.5-flash")
+@inlineCallbacks
+def speak_hint(session, robot_stt, prefetcher):
+    """Speak the next hint while listening for the player.
+
+    Returns what the player said if they cut in (the rest of the hint is then
+    skipped), or None if the hint was spoken to the end.
+    """
+    barge_in = BargeIn()
+    listener = listen_for_barge_in(session, robot_stt)
+    listener.addCallbacks(barge_in.trigger, lambda failure: None)
+    try:
+        yield prefetcher.speak_next(session, barge_in)
+    finally:
+        listener.cancel()
+    return barge_in.text
+
+
+@inlineCallbacks
+def get_robot_guesses(descriptions, count=GUESS_CANDIDATES, rejected=()):
+    """Ask for the `count` best guesses for the descriptions in one request.
+
+    Runs on the LLM worker pool; returns a Deferred firing with a list of
+    (guess, confidence) pairs, best first. Guesses in `rejected` are excluded.
+    """
     if isinstance(descriptions, str):
         descriptions = [descriptions]
-    combined = " | ".join(descriptions) if descriptions else ""
-    prompt = (
-        "You are the matcher in a guessing game.\n"
-        "The director gave these hints (use ALL of them together to guess):\n"
-        f'"{combined}".\n'
-        "Respond in JSON with keys: guess (string), confidence (0 to 1)."
-    )
-    response = model.generate_content(prompt)
-    text = response.text.strip()
-    if text.startswith("```"):
-        text = text.strip("`")
-        text = text.replace("json", "", 1).strip()
-    try:
-        data = json.loads(text)
-        guess = data.get("guess", "").strip()
-        confidence = float(data.get("confidence", 0))
-        return guess, confidence
-    except (json.JSONDecodeError, ValueError, TypeError):
-        return text.splitlines()[0], 0.0
+    prompt = build_guess_prompt(descriptions, count, sorted(rejected))
+    text = yield generate_text(prompt, budget=GUESS_BUDGET)
+    rejected = {guess.lower() for guess in rejected}
+    return [
+        (guess, confidence)
+        for guess, confidence in parse_guess_candidates(text)
+        if guess.lower() not in rejected
+    ]
+
+
+class GuessRound:
+    """Director-mode state for one round: the hints heard, the n-best candidates
+    from the last model call and the guesses the director already turned down.
+
+    The model is only asked again when a new hint adds words we have not heard
+    yet; otherwise the next candidate on the list is used. Before going to the
+    model, the local guess engine gets a try and answers by itself when it is
+    confident enough.
+    """
+
+    def __init__(self, engine=None):
+        self.engine = engine
+        self.descriptions = []
+        self.candidates = []
+        self.rejected = set()
+        self._heard_words = set()
+
+    def add_description(self, description):
+        """Remember a hint; True if it adds something the candidates don't account for yet."""
+        self.descriptions.append(description)
+        words = set(normalize_text(description).lower().split()) - _HINT_FILLER_WORDS
+        new_words = words - self._heard_words
+        self._heard_words |= words
+        # With every candidate turned down there is nothing left to try either
+        return bool(new_words) or not self.best()[0]
+
+    @inlineCallbacks
+    def refresh(self):
+        local = []
+        if self.engine is not None:
+            local = self.engine.rank(
+                self.descriptions, rejected=self.rejected, count=GUESS_CANDIDATES
+            )
+            if local and local[0][1] >= GUESS_CONFIDENCE:
+                print(f"[GUESS] Local match: {local[0][0]} ({local[0][1]:.2f})")
+                self.candidates = local
+                return
+        try:
+            self.candidates = yield get_robot_guesses(self.descriptions, rejected=self.rejected)
+        except Exception as exc:
+            # API is down or too slow: go with whatever the local engine came up with
+            print(f"[GUESS] LLM guess failed ({exc}), using local candidates")
+            self.candidates = local
+
+    def best(self):
+        for guess, confidence in self.candidates:
+            if guess.lower() not in self.rejected:
+                return guess, confidence
+        return "", 0.0
+
+    def reject(self, guess):
+        self.rejected.add(guess.lower())
 
 
 # --- MAIN ---
 @inlineCallbacks
-def main(session, details):
-    print("Robot connected!")
-
-    # 1. Dialogue settings (from the manual)
-    yield session.call("rie.dialogue.config.language", lang="en")
-    # 2. Game Setup (WOW: choose roles)
-    configure_genai()
-    robot_stt = RobotSTT()
-    yield start_robot_mic(session, robot_stt)
-
-    # Stand up first to ensure proper posture
-    yield play_stand(session)
-    # Wave while introducing itself
-    yield say_text(
-        session,
-        "Hi! My name is Alpha. Let's play WOW.",
-        gesture="WAVE"
-    )
+def main(session, details, game):
+    print(f"Robot connected! ({game.realm})")
+
+    robot_stt = game.robot_stt = RobotSTT()
+    # Steps only wait for what they need: the greeting waits for the language
+    # and for the robot to stand, the microphone and Gemini start meanwhile
+    yield run_startup([
+        # 1. Dialogue settings (from the manual)
+        StartupStep(
+            "language",
+            lambda: session.call("rie.dialogue.config.language", lang="en"),
+            (),
+        ),
+        # 2. Game Setup (WOW: choose roles); Gemini is loaded off the reactor
+        # and warmed up while the robot stands and greets
+        StartupStep("genai", preload_genai, ()),
+        # Map the prebuilt hints now instead of on the first guesser round
+        StartupStep("hint store", get_hint_store, ()),
+        StartupStep("microphone", lambda: start_robot_mic(session, robot_stt), ()),
+        # Stand up first to ensure proper posture
+        StartupStep("stand", lambda: play_stand(session), ()),
+        # Wave while introducing itself
+        StartupStep(
+            "greeting",
+            lambda: say_text(session, "Hi! My name is Alpha. Let's play WOW.", gesture="WAVE"),
+            ("language", "stand"),
+        ),
+    ])
 
     role_choice = None
     while True:
         while role_choice is None:
             prompt = "Do you want to play as a director or a guesser?"
             yield say_text_with_prompt_gesture(session, prompt)
-            role_reply = yield listen_text(
-                session, robot_stt,
-                ignore_phrases=[prompt, "Please say director or guesser."],
-            )
+            role_reply = yield listen_text(session, robot_stt)
             if wants_to_stop(role_reply) or wants_no_hint(role_reply):
-                yield goodbye_and_leave(session)
+                yield goodbye_and_leave(session, robot_stt)
                 return
             role_choice = parse_role_choice(role_reply)
             if role_choice is None:
@@ -241,117 +488,151 @@ def main(session, details):
                 session,
                 "Type the target word in the terminal.",
             )
-            print("Enter the target word for the robot to guess: ", end="", flush=True)
-            target_word = input().strip()
+            # Read the word through the reactor so WAMP stays alive while the operator types
+            target_word = yield ask_line(
+                f"[{game.realm}] Enter the target word for the robot to guess: ",
+                timeout=DIRECTOR_WORD_TIMEOUT,
+            )
             if not target_word:
                 target_word = "football"
             attempts = 0
             hint_requests = 0
             guessed = False
-            director_descriptions = []  # Remember all hints the director said
+            guess_round = GuessRound(engine=get_guess_engine())  # Remember all hints the director said
+            next_guess = None  # Runner-up candidate to try without a new hint
             while not guessed and attempts < 3:
-                prompt = "Please describe the word."
-                yield say_text_with_prompt_gesture(session, prompt)
-                description = yield listen_text(session, robot_stt, ignore_phrases=[prompt])
-                if wants_to_stop(description):
-                    yield goodbye_and_leave(session)
-                    return
-                if not description:
-                    yield say_text(
-                        session,
-                        "I did not hear you. Please try again.",
-                        gesture="TOUCH_HEAD"
-                    )
-                    continue
-                director_descriptions.append(description)
-                guess, confidence = get_robot_guess(director_descriptions)
-                if confidence < 0.55 and hint_requests < 3:
-                    hint_requests += 1
-                    yield say_text(
-                        session,
-                        "I am not sure. Can you give another hint?",
-                        gesture="SHRUG"
-                    )
-                    continue
+                if next_guess is not None:
+                    guess, confidence = next_guess
+                    next_guess = None
+                else:
+                    prompt = "Please describe the word."
+                    yield say_text_with_prompt_gesture(session, prompt)
+                    description = yield listen_text(session, robot_stt)
+                    if wants_to_stop(description):
+                        yield goodbye_and_leave(session, robot_stt)
+                        return
+                    if not description:
+                        yield say_text(
+                            session,
+                            "I did not hear you. Please try again.",
+                            gesture="TOUCH_HEAD"
+                        )
+                        continue
+                    if guess_round.add_description(description):
+                        yield guess_round.refresh()
+                    guess, confidence = guess_round.best()
+                    if not guess:
+                        # Nothing left to guess (all turned down, or no answer at all)
+                        yield say_text(
+                            session,
+                            "I have no idea yet. Can you give another hint?",
+                            gesture="SHRUG"
+                        )
+                        continue
+                    if confidence < GUESS_CONFIDENCE and hint_requests < 3:
+                        hint_requests += 1
+                        yield say_text(
+                            session,
+                            "I am not sure. Can you give another hint?",
+                            gesture="SHRUG"
+                        )
+                        continue
                 yield say_text(session, f"My guess is {guess}.")
                 if target_word.lower() == guess.lower():
                     guessed = True
                     yield say_text(session, "Yes! I guessed it!", gesture="APPLAUSE")
                 else:
                     attempts += 1
+                    guess_round.reject(guess)
                     if attempts < 3:
-                        yield say_text(
-                            session,
-                            "Nope. I will try again. Give me another hint.",
-                            gesture="SHAKE_HEAD"
-                        )
+                        runner_up = guess_round.best()
+                        if runner_up[0] and runner_up[1] >= GUESS_CONFIDENCE:
+                            next_guess = runner_up
+                            yield say_text(
+                                session,
+                                "Nope. Let me try again.",
+                                gesture="SHAKE_HEAD"
+                            )
+                        else:
+                            yield say_text(
+                                session,
+                                "Nope. I will try again. Give me another hint.",
+                                gesture="SHAKE_HEAD"
+                            )
             if not guessed:
                 yield say_text(session, "Good game! I will get it next time.")
         else:
             # Human is matcher, robot is director
-            global LAST_WORD
-            choices = [word for word in TARGET_WORDS if word != LAST_WORD]
+            choices = [word for word in TARGET_WORDS if word != game.last_word]
             if not choices:
                 choices = TARGET_WORDS[:]
             target_word = random.choice(choices)
-            LAST_WORD = target_word
-            robot_descriptions = []  # Remember what we already said for extra hints
-            script = get_robot_description(target_word)
-            robot_descriptions.append(script)
+            game.last_word = target_word
+            max_hints = 3
+            # Start generating the first hint while the robot stands up and introduces the round
+            prefetcher = HintPrefetcher(
+                target_word,
+                max_hints=max_hints + 1,
+                cache=get_hint_cache(),
+                store=get_hint_store(),
+            )
+            prefetcher.start()
 
             print(f"Target Word: {target_word}")
 
-            # 3. Robot Actions
-            yield play_stand(session)
-            yield say_text(
-                session,
-                "Okay, you are the guesser. I will describe a word. Try to guess it.",
-                gesture="NOD"
-            )
-            yield speak_with_gestures(session, script, GESTURE_MAP)
-
-            # Optional extra hints
-            max_hints = 3
-            hints_given = 0
-            while hints_given < max_hints:
-                hint_prompt = "Do you want another hint?"
-                yield say_text_with_prompt_gesture(session, hint_prompt)
-                reply = yield listen_text(
-                    session, robot_stt,
-                    ignore_phrases=[hint_prompt, "Please say yes or no."],
+            try:
+                # 3. Robot Actions
+                yield play_stand(session)
+                yield say_text(
+                    session,
+                    "Okay, you are the guesser. I will describe a word. Try to guess it.",
+                    gesture="NOD"
                 )
-                if wants_to_stop(reply):
-                    yield goodbye_and_leave(session)
-                    return
-                if not reply:
-                    yield say_text_with_prompt_gesture(
-                        session,
-                        "Please say yes or no.",
-                    )
-                    yield play_no_hear(session)
-                    continue
-                if wants_no_hint(reply):
-                    break
-                if not wants_more_hint(reply):
-                    yield say_text_with_prompt_gesture(session, "Please say yes or no.")
-                    continue
-                hints_given += 1
-                script = get_robot_description(target_word, previous_descriptions=robot_descriptions)
-                robot_descriptions.append(script)
-                yield speak_with_gestures(session, script, GESTURE_MAP)
-
-            guess_prompt = "What word am I describing?"
-            yield say_text_with_prompt_gesture(session, guess_prompt)
+                # Hint is spoken sentence by sentence while it streams in;
+                # the next one is generated as soon as this one is complete.
+                # A player who already knows the word can answer mid-hint.
+                early_guess = yield speak_hint(session, robot_stt, prefetcher)
+
+                # Optional extra hints
+                hints_given = 0
+                while early_guess is None and hints_given < max_hints:
+                    hint_prompt = "Do you want another hint?"
+                    yield say_text_with_prompt_gesture(session, hint_prompt)
+                    reply = yield listen_text(session, robot_stt)
+                    if wants_to_stop(reply):
+                        yield goodbye_and_leave(session, robot_stt)
+                        return
+                    if not reply:
+                        yield say_text_with_prompt_gesture(
+                            session,
+                            "Please say yes or no.",
+                        )
+                        yield play_no_hear(session)
+                        continue
+                    if wants_no_hint(reply):
+                        break
+                    if not wants_more_hint(reply):
+                        yield say_text_with_prompt_gesture(session, "Please say yes or no.")
+                        continue
+                    hints_given += 1
+                    early_guess = yield speak_hint(session, robot_stt, prefetcher)
+            finally:
+                # Round is past the hint phase: throw away any unused prefetched hint
+                prefetcher.discard()
+
+            if early_guess is None:
+                guess_prompt = "What word am I describing?"
+                yield say_text_with_prompt_gesture(session, guess_prompt)
 
             guessed = False
             attempts = 0
             while not guessed and attempts < 3:
-                guess = yield listen_text(
-                    session, robot_stt,
-                    ignore_phrases=[guess_prompt, "Nope, try again.", "I did not hear you. Please say it again."],
-                )
+                if early_guess is not None:
+                    guess, early_guess = early_guess, None
+                else:
+                    guess = yield listen_text(session, robot_stt)
                 if wants_to_stop(guess):
-                    yield goodbye_and_leave(session)
+                    yield goodbye_and_leave(session, robot_stt)
                     return
                 if not guess:
                     yield say_text(
@@ -378,12 +659,9 @@ def main(session, details):
         while replay_choice is None:
             replay_prompt = "Play again as director, guesser, or stop?"
             yield say_text_with_prompt_gesture(session, replay_prompt)
-            replay_reply = yield listen_text(
-                session, robot_stt,
-                ignore_phrases=[replay_prompt, "Please say director, guesser, or stop."],
-            )
+            replay_reply = yield listen_text(session, robot_stt)
             if wants_to_stop(replay_reply):
-                yield goodbye_and_leave(session)
+                yield goodbye_and_leave(session, robot_stt)
                 return
             replay_choice = parse_replay_choice(replay_reply)
             if replay_choice is None:
@@ -397,21 +675,12 @@ def main(session, details):
             break
         role_choice = replay_choice
 
-    yield stop_robot_mic(session)
+    yield stop_robot_mic(session, robot_stt)
+    yield gesture_timeline(session).when_idle()
+    print(f"[GESTURE] Motion stats: {motion_arbiter(session).stats()}")
     session.leave()
 
 
-wamp = Component(
-    transports=[
-        {
-            "url": "ws://wamp.robotsindeklas.nl",
-            "serializers": ["msgpack"],
-            "max_retries": 0,
-        }
-    ],
-    realm="rie.6992eb2fe14c6bd0843c5ff2",
-)
-wamp.on_join(main)
-
 if __name__ == "__main__":
-    run([wamp])
\ No newline at end of file
+    # python main.py [realm ...]: one game per robot, all in this process
+    SessionManager(read_realms(), main).run()
\ No newline at end of file
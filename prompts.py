@@ -0,0 +1,107 @@
+import json
+
+from gestures import GESTURE_MAP
+
+
+def build_description_prompt(target_word, previous_descriptions=None):
+    available_actions = ", ".join([f"[{k}]" for k in GESTURE_MAP.keys()])
+    prompt = (
+        "You are a social robot playing a guessing game.\n"
+        f'Target word: "{target_word}".\n'
+    )
+    if previous_descriptions:
+        prompt += (
+            "You already said these hints (do NOT repeat or rephrase them):\n"
+            + "\n".join(f"- {d}" for d in previous_descriptions)
+            + "\nGive ONE new, different hint. "
+        )
+    else:
+        prompt += "1. Describe it without saying the word.\n"
+    prompt += (
+        f"2. Use gesture tags like {available_actions}.\n"
+        "3. Keep it very short.\n"
+    )
+    return prompt
+
+
+def clean_description(text):
+    text = text.strip()
+    text = text.replace("```", "")
+    text = text.replace("\n", " ")
+    text = " ".join(text.split())
+    return text
+
+
+def build_ladder_prompt(target_word, count):
+    available_actions = ", ".join([f"[{k}]" for k in GESTURE_MAP.keys()])
+    return (
+        "You are a social robot playing a guessing game.\n"
+        f'Target word: "{target_word}".\n'
+        f"Write {count} different hints, from vague to more and more obvious.\n"
+        "1. Describe it without saying the word.\n"
+        f"2. Use gesture tags like {available_actions}.\n"
+        "3. Keep every hint very short.\n"
+        "Respond in JSON as a list of strings, one string per hint."
+    )
+
+
+def strip_json_fence(text):
+    text = text.strip()
+    if text.startswith("```"):
+        text = text.strip("`")
+        text = text.replace("json", "", 1).strip()
+    return text
+
+
+def parse_hint_ladder(text):
+    """Return the list of cleaned hints in a ladder response ([] if it is not usable)."""
+    try:
+        data = json.loads(strip_json_fence(text))
+    except (json.JSONDecodeError, ValueError, TypeError):
+        return []
+    if isinstance(data, dict):
+        data = data.get("hints", [])
+    if not isinstance(data, list):
+        return []
+    hints = [clean_description(str(hint)) for hint in data if hint]
+    return [hint for hint in hints if hint]
+
+
+def build_guess_prompt(descriptions, count, rejected=()):
+    combined = " | ".join(descriptions) if descriptions else ""
+    prompt = (
+        "You are the matcher in a guessing game.\n"
+        "The director gave these hints (use ALL of them together to guess):\n"
+        f'"{combined}".\n'
+    )
+    if rejected:
+        prompt += (
+            "These guesses were already wrong, do NOT guess them again: "
+            + ", ".join(rejected)
+            + ".\n"
+        )
+    prompt += (
+        f"Give your {count} best different guesses, most likely first.\n"
+        'Respond in JSON with key "candidates": a list of objects with keys '
+        "guess (string), confidence (0 to 1)."
+    )
+    return prompt
+
+
+def parse_guess_candidates(text):
+    """Return [(guess, confidence), ...] from a guess response, best first."""
+    text = strip_json_fence(text)
+    try:
+        data = json.loads(text)
+        if isinstance(data, dict):
+            data = data.get("candidates", [data])
+        candidates = []
+        for item in data:
+            guess = str(item.get("guess", "")).strip()
+            if guess:
+                candidates.append((guess, float(item.get("confidence", 0))))
+    except (json.JSONDecodeError, ValueError, TypeError, AttributeError):
+        first_line = text.splitlines()[0] if text else ""
+        return [(first_line, 0.0)] if first_line else []
+    candidates.sort(key=lambda candidate: candidate[1], reverse=True)
+    return candidates
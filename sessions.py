@@ -0,0 +1,83 @@
+import os
+import sys
+
+from autobahn.twisted.component import Component, run
+
+from llm import set_robot_count
+
+WAMP_URL = "ws://wamp.robotsindeklas.nl"
+DEFAULT_REALMS = ["rie.6992eb2fe14c6bd0843c5ff2"]
+# Realms can also come from the command line or a comma-separated environment variable
+REALMS_ENV = "WOW_REALMS"
+REALMS_PATH = os.path.join(os.path.dirname(__file__), "realms.txt")
+
+
+def read_realms(argv=None):
+    """Realms to connect to: command line, then $WOW_REALMS, then realms.txt, then the default."""
+    argv = sys.argv[1:] if argv is None else argv
+    realms = [realm for arg in argv for realm in arg.split(",")]
+    if not realms:
+        realms = os.getenv(REALMS_ENV, "").split(",")
+    if not any(realm.strip() for realm in realms) and os.path.exists(REALMS_PATH):
+        with open(REALMS_PATH, "r", encoding="utf-8") as handle:
+            realms = [line.split("#", 1)[0] for line in handle]
+    realms = [realm.strip() for realm in realms if realm.strip()]
+    # Keep the order but connect to every robot once
+    return list(dict.fromkeys(realms)) or DEFAULT_REALMS[:]
+
+
+class GameState:
+    """Round state of one robot that outlives a single WAMP session."""
+
+    def __init__(self, realm):
+        self.realm = realm
+        self.last_word = None
+        self.robot_stt = None
+
+
+class SessionManager:
+    """Runs one WAMP component per robot realm inside a single reactor.
+
+    Every robot gets its own GameState; the LLM pool, hint cache, hint store
+    and gesture store are module-level and shared by all of them; the LLM
+    pool gets workers for every robot.
+    """
+
+    def __init__(self, realms, on_join, url=WAMP_URL):
+        set_robot_count(len(realms))
+        self.games = {realm: GameState(realm) for realm in realms}
+        self.active = set()
+        self.components = [self._component(realm, url, on_join) for realm in realms]
+
+    def _component(self, realm, url, on_join):
+        component = Component(
+            transports=[
+                {
+                    "url": url,
+                    "serializers": ["msgpack"],
+                    "max_retries": 0,
+                }
+            ],
+            realm=realm,
+        )
+
+        def joined(session, details):
+            self.active.add(realm)
+            print(f"[SESSION] {realm} joined ({len(self.active)} of {len(self.games)} robots)")
+            return on_join(session, details, self.games[realm])
+
+        def left(session, details):
+            self.active.discard(realm)
+            game = self.games[realm]
+            # The connection may drop mid-game; don't leave the STT worker running
+            if game.robot_stt is not None:
+                game.robot_stt.stop()
+                game.robot_stt = None
+            print(f"[SESSION] {realm} left ({len(self.active)} of {len(self.games)} robots)")
+
+        component.on_join(joined)
+        component.on_leave(left)
+        return component
+
+    def run(self):
+        run(self.components)
@@ -0,0 +1,86 @@
+from collections import namedtuple
+
+from twisted.internet import reactor
+from twisted.internet.defer import (
+    Deferred,
+    DeferredList,
+    FirstError,
+    inlineCallbacks,
+    maybeDeferred,
+)
+from twisted.python.failure import Failure
+
+# run is called without arguments once every step named in `after` is done
+StartupStep = namedtuple("StartupStep", ["name", "run", "after"])
+
+
+def _timed(step, timings):
+    started = reactor.seconds()
+
+    def record(result):
+        timings[step.name] = reactor.seconds() - started
+        outcome = "failed" if isinstance(result, Failure) else "done"
+        print(f"[STARTUP] {step.name} {outcome} in {timings[step.name]:.2f}s")
+        return result
+
+    return maybeDeferred(step.run).addBoth(record)
+
+
+def _observe(d):
+    """A new Deferred with d's result, leaving d's own result untouched."""
+    copy = Deferred()
+
+    def forward(result):
+        if isinstance(result, Failure):
+            copy.errback(result)
+        else:
+            copy.callback(result)
+        return result
+
+    d.addBoth(forward)
+    return copy
+
+
+def _root_failure(failure):
+    # A step whose dependency failed fails with a FirstError around that failure
+    while isinstance(failure.value, FirstError):
+        failure = failure.value.subFailure
+    return failure
+
+
+@inlineCallbacks
+def run_startup(steps):
+    """Run startup steps as a dependency graph; steps without a path between them run at once.
+
+    Steps must be listed after the steps they depend on. Returns {name: result};
+    the first failing step's error is raised and steps depending on it are
+    not run.
+    """
+    started = reactor.seconds()
+    timings = {}
+    running = {}
+    for step in steps:
+        missing = [name for name in step.after if name not in running]
+        if missing:
+            raise ValueError(f"Startup step {step.name} depends on unknown steps {missing}")
+        if not step.after:
+            running[step.name] = _timed(step, timings)
+            continue
+        waiting = DeferredList(
+            [_observe(running[name]) for name in step.after],
+            fireOnOneErrback=True,
+            consumeErrors=True,
+        )
+        running[step.name] = waiting.addCallback(lambda _, step=step: _timed(step, timings))
+    try:
+        results = yield DeferredList(
+            list(running.values()), fireOnOneErrback=True, consumeErrors=True
+        )
+    except FirstError as error:
+        _root_failure(error.subFailure).raiseException()
+    total = reactor.seconds() - started
+    print(
+        f"[STARTUP] Ready in {total:.2f}s "
+        f"(steps add up to {sum(timings.values()):.2f}s)"
+    )
+    return {step.name: result for step, (_, result) in zip(steps, results)}
@@ -1,98 +1,328 @@
+import queue
+import threading
+from collections import deque
+
+import numpy as np
 from alpha_mini_rug.speech_to_text import SpeechToText
 from autobahn.twisted.util import sleep
-from twisted.internet.defer import inlineCallbacks
+from twisted.internet import reactor
+from twisted.internet.defer import Deferred, DeferredList, inlineCallbacks
+
+from echo import echo_words, is_echo_of, is_fragment_of
+from tts import speech_log
+from vad import SAMPLE_RATE, AdaptiveVAD, frame_pcm
 
 HEARING_SENSITIVITY = 1400
-SILENCE_TIME = 2.5  # Increased to allow longer pauses between words
-SILENCE_THRESHOLD = 600
+SILENCE_TIME = 2.5  # Longest pause allowed inside an utterance
+SILENCE_THRESHOLD = 600  # Used until the VAD has calibrated on real frames
+# Frames waiting for the recognition worker; about 10 s of audio at 10 frames/s.
+# When the worker falls that far behind, new frames are dropped instead of queued.
+FRAME_QUEUE_SIZE = 100
+PREROLL_FRAMES = 3  # Frames kept from before speech starts so the first word isn't clipped
+MAX_UTTERANCE = 10.0  # Seconds; longer speech is recognized in pieces
+RECENT_RECOGNITIONS = 20  # Recognized utterances kept for logging/debugging
+BARGE_IN_POLL = 30.0  # next_utterance timeout while listening during speech
+# How long after the robot stops talking the mic may still pick up its voice.
+# Starts here and adapts: longer when echoes get through, shorter on clean turns.
+ECHO_TAIL_START = 0.8
+ECHO_TAIL_MIN = 0.2
+ECHO_TAIL_MAX = 2.5
+
+
+class EchoGate:
+    """Decides when the mic opens after the robot has spoken."""
+
+    def __init__(self):
+        self.tail = ECHO_TAIL_START
+
+    def delay(self, log):
+        """Seconds to wait before listening, given the session's SpeechLog."""
+        return max(0.0, log.last_end + self.tail - reactor.seconds())
+
+    def echo_heard(self):
+        self.tail = min(ECHO_TAIL_MAX, self.tail * 1.5 + 0.1)
+
+    def clean_turn(self):
+        self.tail = max(ECHO_TAIL_MIN, self.tail * 0.9)
 
 
 class RobotSTT:
+    """Robot microphone with speech recognition on a worker thread.
+
+    The hearing-stream callback only puts the frame into a bounded queue. A
+    worker thread runs the VAD, which ends utterances from NumPy window energies
+    instead of SpeechToText's per-sample loop, hands each finished utterance to
+    SpeechToText for recognition, then passes the words back to the reactor
+    with callFromThread. Frames are passed by reference and read through
+    zero-copy NumPy views.
+
+    Memory stays bounded for sessions of any length: frames that arrive while
+    nobody is listening are dropped, the recognizer's word list is emptied after
+    every utterance, and only the last RECENT_RECOGNITIONS results are kept.
+    """
+
     def __init__(self):
         self.audio = SpeechToText()
-        # Manual suggests tuning this value (100-500 typical).
-        # We use a higher threshold to ignore ambient fan/noise.
-        self.audio.silence_time = SILENCE_TIME
-        self.audio.silence_threshold2 = SILENCE_THRESHOLD
         self.audio.logging = False
         self.audio.do_speech_recognition = True
+        # Utterances are cut by our VAD and handed over whole
+        self.audio.mode_continues = True
+        self.echo_gate = EchoGate()
+        # Decides where utterances start and end from the measured noise floor
+        self.vad = AdaptiveVAD(max_hangover=SILENCE_TIME, fallback_threshold=SILENCE_THRESHOLD)
+        self._preroll = deque(maxlen=PREROLL_FRAMES)
+        self._utterance = []
+        self._utterance_samples = 0
+        self._waiter = None
+        self._timeout_call = None
+        self._frames = queue.Queue(maxsize=FRAME_QUEUE_SIZE)
+        self._worker = None
+        self._running = False
+        # Bumped by reset(); words recognized before the latest reset are dropped
+        self._generation = 0
+        self._reset_requested = threading.Event()
+        self.listening = False
+        self.recent = deque(maxlen=RECENT_RECOGNITIONS)
+        self.frames_received = 0
+        self.frames_idle = 0
+        self.frames_dropped = 0
+        self.bytes_received = 0
+        self.recognitions = 0
         print(
             "[STT] Robot microphone initialized "
-            f"(silence_time={SILENCE_TIME}, threshold={SILENCE_THRESHOLD})"
+            f"(max pause={SILENCE_TIME}s, threshold={SILENCE_THRESHOLD})"
         )
 
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._worker = threading.Thread(target=self._recognize, name="stt", daemon=True)
+        self._worker.start()
+        reactor.addSystemEventTrigger("before", "shutdown", self.stop)
+
+    def stop(self):
+        self._running = False
+
+    def on_frame(self, frame):
+        """Hearing-stream callback (reactor thread): queue the frame for the worker."""
+        self.frames_received += 1
+        if not self.listening:
+            self.frames_idle += 1
+            return
+        pcm = frame_pcm(frame)
+        if pcm is not None:
+            self.bytes_received += len(pcm)
+        try:
+            # Tagged with the generation so frames queued before a reset are skipped
+            self._frames.put_nowait((self._generation, frame))
+        except queue.Full:
+            self.frames_dropped += 1
+
+    def _recognize(self):
+        """Worker thread: VAD, frame accumulation and speech recognition."""
+        while self._running:
+            try:
+                queued_generation, frame = self._frames.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if self._reset_requested.is_set():
+                self._reset_requested.clear()
+                self._clear_audio()
+            generation = self._generation
+            if queued_generation != generation:
+                continue
+            pcm = frame_pcm(frame)
+            if pcm is None:
+                continue
+            samples = np.frombuffer(pcm, dtype=np.int16)
+            self.vad.process(pcm)
+            if not self.vad.in_speech():
+                if self._utterance:
+                    # The VAD took it back (a click); don't glue it onto the next answer
+                    self._utterance = []
+                    self._utterance_samples = 0
+                self._preroll.append(samples)
+                continue
+            if not self._utterance:
+                self._utterance.extend(self._preroll)
+                self._preroll.clear()
+            self._utterance.append(samples)
+            self._utterance_samples += len(samples)
+            too_long = self._utterance_samples >= MAX_UTTERANCE * SAMPLE_RATE
+            if not (self.vad.utterance_ended() or too_long):
+                continue
+            utterance = self._utterance
+            self._utterance = []
+            self._utterance_samples = 0
+            self.vad.end_utterance()
+            self.audio.proses_audio(utterance)
+            if self.audio.new_words:
+                words = list(self.audio.give_me_words() or [])
+                # Don't let the recognizer's word list grow over the session
+                self.audio.words = []
+                self.audio.new_words = False
+                reactor.callFromThread(self._deliver, words, generation)
+
+    def _clear_audio(self):
+        # Drop the partial utterance too, or it is glued onto the next answer
+        self.audio.words = []
+        self.audio.new_words = False
+        self.audio.audio_frames = []
+        self.audio.silence_counter = 0
+        self.audio.to_proses_frames = []
+        self.audio.processing = False
+        self._preroll.clear()
+        self._utterance = []
+        self._utterance_samples = 0
+        self.vad.end_utterance()
+
+    def next_utterance(self, timeout):
+        """Deferred firing with the next recognized text, or None after `timeout` seconds."""
+        self._clear_waiter()
+        d = Deferred(lambda _: self._clear_waiter())
+        self._waiter = d
+        self._timeout_call = reactor.callLater(timeout, self._resolve, None)
+        return d
+
+    def reset(self):
+        """Forget anything heard or recognized so far, including queued audio."""
+        self._generation += 1
+        self._reset_requested.set()
+
+    def stats(self):
+        """Counters for monitoring long-running deployments."""
+        return {
+            "frames_received": self.frames_received,
+            "frames_idle": self.frames_idle,
+            "frames_dropped": self.frames_dropped,
+            "bytes_received": self.bytes_received,
+            "queue_depth": self._frames.qsize(),
+            "recognitions": self.recognitions,
+            "recent": len(self.recent),
+        }
+
+    def _deliver(self, words, generation):
+        if words:
+            self.recognitions += 1
+            self.recent.append(words[-1])
+        if generation != self._generation:
+            # Recognized before the last reset (e.g. the robot's own voice)
+            return
+        if not words or self._waiter is None:
+            # Nobody is listening right now: drop it
+            return
+        text = words[-1]
+        if isinstance(text, (list, tuple)):
+            text = text[0] if text else ""
+        text = str(text).strip() if text else ""
+        self._resolve(text)
+
+    def _resolve(self, text):
+        waiter = self._waiter
+        self._clear_waiter()
+        if waiter is not None:
+            waiter.callback(text)
+
+    def _clear_waiter(self):
+        self._waiter = None
+        if self._timeout_call is not None and self._timeout_call.active():
+            self._timeout_call.cancel()
+        self._timeout_call = None
+
 
 @inlineCallbacks
 def start_robot_mic(session, robot_stt):
-    yield session.call("rom.sensor.hearing.sensitivity", HEARING_SENSITIVITY)
-    yield session.call("rie.dialogue.config.language", lang="en")
-    # Only one subscriber as recommended in the manual
-    yield session.subscribe(robot_stt.audio.listen_continues, "rom.sensor.hearing.stream")
+    robot_stt.start()
+    # Sensitivity and the subscription don't depend on each other; the stream
+    # only starts once there is a subscriber. Only one subscriber as
+    # recommended in the manual
+    yield DeferredList(
+        [
+            session.call("rom.sensor.hearing.sensitivity", HEARING_SENSITIVITY),
+            session.subscribe(robot_stt.on_frame, "rom.sensor.hearing.stream"),
+        ],
+        fireOnOneErrback=True,
+        consumeErrors=True,
+    )
     yield session.call("rom.sensor.hearing.stream")
     print(f"[STT] Hearing stream started (sensitivity={HEARING_SENSITIVITY})")
 
 
 @inlineCallbacks
-def stop_robot_mic(session):
+def stop_robot_mic(session, robot_stt=None):
     yield session.call("rom.sensor.hearing.close")
+    if robot_stt is not None:
+        robot_stt.stop()
+        print(f"[STT] Hearing stream closed {robot_stt.stats()}")
 
 
-# Minimum length for "heard in phrase" to count as echo (so we don't ignore "yes"/"no")
-_MIN_ECHO_LENGTH = 12
-
+def _is_robot_self_heard(session, heard_text, ignore_phrases=None, tail=0.0):
+    """True if heard_text is likely the robot's own TTS: anything it said recently, or one of ignore_phrases.
 
-def _is_robot_self_heard(heard_text, ignore_phrases):
-    """True if heard_text is likely the robot's own TTS (matches something we should ignore)."""
-    if not ignore_phrases or not heard_text:
+    While the robot is talking, or less than `tail` seconds after, even a short
+    fragment of the current or previous sentence counts.
+    """
+    if not heard_text:
         return False
-    h = str(heard_text).lower().strip()
-    for phrase in ignore_phrases:
-        p = str(phrase).lower().strip()
-        if not p:
-            continue
-        if h == p:
-            return True
-        # Robot's phrase is contained in what we heard (user/echo repeated the prompt)
-        if p in h and len(h) - len(p) < 20:
-            return True
-        # Heard text is contained in robot's phrase - only treat as echo if heard is long enough,
-        # so we don't ignore short valid answers like "yes" or "no" that happen to appear in the prompt
-        if h in p and len(p) - len(h) < 20 and len(h) >= _MIN_ECHO_LENGTH:
+    log = speech_log(session)
+    heard = echo_words(heard_text)
+    if log.speaking or reactor.seconds() - log.last_end <= tail:
+        if any(is_fragment_of(heard, spoken) for spoken in log.history.latest(2)):
             return True
-    return False
+    if log.history.matches(heard_text, reactor.seconds()):
+        return True
+    return any(is_echo_of(heard, echo_words(phrase)) for phrase in ignore_phrases or ())
 
 
 @inlineCallbacks
 def listen_from_robot(session, robot_stt, timeout_seconds=12, ignore_phrases=None):
     # Clear buffer to prevent hearing robot's own voice
-    robot_stt.audio.words = []
-    robot_stt.audio.new_words = False
-
-    # Grace period: ignore any speech for 2s after we start (catches TTS echo)
-    yield sleep(2.0)
-    robot_stt.audio.words = []
-    robot_stt.audio.new_words = False
-
-    waited = 0.0
-    while True:
-        if not robot_stt.audio.new_words:
-            robot_stt.audio.loop()
-            yield sleep(0.5)
-            waited += 0.5
-            if waited >= timeout_seconds:
+    robot_stt.reset()
+
+    # Open the mic once the robot has finished talking plus the echo tail
+    log = speech_log(session)
+    yield log.when_quiet()
+    delay = robot_stt.echo_gate.delay(log)
+    if delay > 0:
+        yield sleep(delay)
+    robot_stt.reset()
+
+    deadline = reactor.seconds() + timeout_seconds
+    robot_stt.listening = True
+    try:
+        while True:
+            # Fires as soon as the recognizer finishes an utterance
+            text = yield robot_stt.next_utterance(max(0.0, deadline - reactor.seconds()))
+            if text is None:
                 print("[STT] Robot mic heard: (timeout)")
                 return ""
-            continue
-        words = robot_stt.audio.give_me_words()
-        if words:
-            text = words[-1]
-            if isinstance(text, (list, tuple)):
-                text = text[0] if text else ""
-            text = str(text).strip() if text else ""
-            if _is_robot_self_heard(text, ignore_phrases):
+            if _is_robot_self_heard(session, text, ignore_phrases, robot_stt.echo_gate.tail):
                 print(f"[STT] Ignoring (robot's own voice): {text!r}")
-                robot_stt.audio.words = []
-                robot_stt.audio.new_words = False
+                robot_stt.echo_gate.echo_heard()
                 continue
+            robot_stt.echo_gate.clean_turn()
             print(f"[STT] Robot mic heard: {text}")
             return text
+    finally:
+        robot_stt.listening = False
+
+
+@inlineCallbacks
+def listen_for_barge_in(session, robot_stt):
+    """Listen while the robot is talking; fires with the first utterance that is not
+    the robot's own voice. Cancel it once the robot has finished talking."""
+    robot_stt.reset()
+    robot_stt.listening = True
+    try:
+        while True:
+            text = yield robot_stt.next_utterance(BARGE_IN_POLL)
+            if not text:
+                continue
+            if _is_robot_self_heard(session, text, tail=robot_stt.echo_gate.tail):
+                print(f"[STT] Ignoring (robot's own voice): {text!r}")
+                continue
+            print(f"[STT] Player cut in: {text}")
+            return text
+    finally:
+        robot_stt.listening = False
@@ -1,35 +1,219 @@
 import random
 import re
+from collections import namedtuple
+from functools import lru_cache
+from weakref import WeakKeyDictionary
 
 from autobahn.twisted.util import sleep
-from twisted.internet.defer import inlineCallbacks
+from twisted.internet import reactor
+from twisted.internet.defer import (
+    CancelledError,
+    Deferred,
+    DeferredList,
+    DeferredQueue,
+    inlineCallbacks,
+    succeed,
+)
 
-from gestures import play_gesture, play_idle
+from echo import SpokenHistory
+from gestures import GESTURE_MAP, GESTURES, IDLE_GESTURES, gesture_duration, play_gesture
+
+# Speaking rate before any speech was measured; refined from every sentence said
+SPEECH_SECONDS_PER_CHAR = 0.07
+SPEECH_RATE_ADAPT = 0.2
+SENTENCE_PAUSE = 0.1
+IDLE_GESTURE_CHANCE = 0.2
+
+
+class SpeechLog:
+    """Tracks when a robot is talking and what it said recently, so the
+    microphone can tell its own voice apart from the player's."""
+
+    def __init__(self):
+        self.speaking = 0
+        self.last_end = 0.0
+        self.history = SpokenHistory()
+        self.seconds_per_char = SPEECH_SECONDS_PER_CHAR
+        self._quiet_waiters = []
+
+    def when_quiet(self):
+        """Deferred firing once the robot is not speaking."""
+        if not self.speaking:
+            return succeed(None)
+        d = Deferred()
+        self._quiet_waiters.append(d)
+        return d
+
+    def started(self, text):
+        self.speaking += 1
+        self.history.record(text, reactor.seconds())
+
+    def estimate(self, text):
+        """Expected seconds to say text at the measured speaking rate."""
+        return len(text) * self.seconds_per_char
+
+    def measured(self, text, seconds):
+        per_char = seconds / max(1, len(text))
+        # Failed or stopped speech returns early; don't let it skew the rate
+        if 0.02 <= per_char <= 0.2:
+            self.seconds_per_char += SPEECH_RATE_ADAPT * (per_char - self.seconds_per_char)
+
+    def finished(self):
+        self.speaking -= 1
+        self.last_end = reactor.seconds()
+        if not self.speaking:
+            waiters, self._quiet_waiters = self._quiet_waiters, []
+            for d in waiters:
+                d.callback(None)
+
+
+_speech_logs = WeakKeyDictionary()
+
+
+def speech_log(session):
+    log = _speech_logs.get(session)
+    if log is None:
+        log = _speech_logs[session] = SpeechLog()
+    return log
+
+
+@inlineCallbacks
+def _say(session, text):
+    log = speech_log(session)
+    log.started(text)
+    started = reactor.seconds()
+    try:
+        yield session.call("rie.dialogue.say", text=text)
+    except Exception as exc:
+        print(f"[TTS] Failed to speak: {exc}")
+    else:
+        log.measured(text, reactor.seconds() - started)
+    finally:
+        log.finished()
+
+
+class GestureTimeline:
+    """Schedules a robot's gestures so they run next to its speech.
+
+    A gesture is handed to the robot's motion arbiter `delay` seconds from now,
+    so speech never waits for motion; gestures that need the same joints are
+    queued by the arbiter, and those still queued when the player barges in
+    are cancelled. Only callers that need the robot to be still (e.g.
+    before leaving) wait for when_idle().
+    """
+
+    def __init__(self):
+        self._pending = set()
+
+    def busy(self):
+        return bool(self._pending)
+
+    def at(self, session, key, delay=0.0, barge_in=None, idle=False):
+        """Schedule a gesture; returns a Deferred firing once it has been played."""
+        done = Deferred()
+        self._pending.add(done)
+        done.addBoth(self._finished, done)
+        reactor.callLater(delay, self._start, session, key, done, barge_in, idle)
+        return done
+
+    def when_idle(self):
+        if not self._pending:
+            return succeed(None)
+        return DeferredList(list(self._pending), consumeErrors=True)
+
+    def _start(self, session, key, done, barge_in, idle):
+        if barge_in is not None and barge_in.fired:
+            done.callback(None)
+            return
+        played = play_gesture(session, key, idle)
+        if barge_in is not None:
+            # Gestures still queued at the arbiter when the player cuts in are dropped
+            barge_in.wait().addCallback(lambda _: played.cancel())
+        played.addErrback(lambda failure: None if failure.check(CancelledError) else failure)
+        played.chainDeferred(done)
+
+    def _finished(self, result, done):
+        self._pending.discard(done)
+        return None
+
+
+_timelines = WeakKeyDictionary()
+
+
+def gesture_timeline(session):
+    timeline = _timelines.get(session)
+    if timeline is None:
+        timeline = _timelines[session] = GestureTimeline()
+    return timeline
+
+
+class BargeIn:
+    """Signal that the player cut in while the robot was talking.
+
+    trigger() is called with what the player said; speech that is playing is
+    stopped and remaining sentences and gestures are skipped.
+    """
+
+    def __init__(self):
+        self.text = None
+        self._waiters = []
+
+    @property
+    def fired(self):
+        return self.text is not None
+
+    def trigger(self, text):
+        if self.fired:
+            return
+        self.text = text
+        waiters, self._waiters = self._waiters, []
+        for d in waiters:
+            d.callback(text)
+
+    def wait(self):
+        if self.fired:
+            return succeed(self.text)
+        d = Deferred()
+        self._waiters.append(d)
+        return d
+
+
+def _interruptible(d, barge_in):
+    """Wait for d, but stop waiting as soon as the player barges in."""
+    if barge_in is None:
+        return d
+    race = DeferredList([d, barge_in.wait()], fireOnOneCallback=True, consumeErrors=True)
+    # fireOnOneCallback fires with (result, index); an all-failed race fires with a list
+    race.addCallback(lambda result: result[0] if isinstance(result, tuple) else None)
+    return race
+
+
+@inlineCallbacks
+def _stop_speaking(session):
+    try:
+        yield session.call("rie.dialogue.stop")
+    except Exception as exc:
+        print(f"[TTS] Failed to stop speech: {exc}")
 
 
 @inlineCallbacks
 def say_text(session, text, gesture=None):
     # Clean and validate text before speaking
-    text = str(text).strip()
-    # Remove problematic characters
-    text = text.replace('"', '').replace("'", '').replace('`', '')
-    text = ' '.join(text.split())  # Normalize whitespace
-    
+    clean_text = clean_speech(str(text))
+
     # Skip empty or too short text
-    if len(text) < 2:
+    if not clean_text:
         print(f"[TTS] Skipped invalid text: '{text}'")
         return
-    
+    text = clean_text
+
     print(f"[TTS] {text}")
-    
+
     # Start gesture simultaneously with speech if provided
     if gesture:
-        play_gesture(session, gesture)  # Don't yield - start it in parallel
-    
-    try:
-        yield session.call("rie.dialogue.say", text=text)
-    except Exception as exc:
-        print(f"[TTS] Failed to speak: {exc}")
+        gesture_timeline(session).at(session, gesture)
+
+    yield _say(session, text)
     # Shorter pause for faster conversation flow
     yield sleep(0.1)
 
@@ -40,41 +224,175 @@ def say_text_with_prompt_gesture(session, text):
     yield say_text(session, text)
 
 
-@inlineCallbacks
-def speak_with_gestures(session, script, gesture_map):
-    normalized = " ".join(script.replace("\n", " ").split())
-    parts = re.split(r'(\[[A-Z_]+\])', normalized)
-    for part in parts:
+# Complete [GESTURE] tag, or the end of a sentence followed by whitespace
+_SEGMENT_BREAK = re.compile(r"\[[A-Za-z_ ]+\]|[.!?]+(?=\s)")
+
+
+class ScriptStream:
+    """Cuts LLM text into sentences and [GESTURE] tags as it arrives.
+
+    feed() can be called with arbitrary chunks; complete segments are queued
+    right away so speak_stream() can start talking before the text is done.
+    """
+
+    def __init__(self):
+        self._buffer = ""
+        self._segments = DeferredQueue()
+        self.emitted = 0
+        self.closed = False
+
+    def feed(self, text):
+        if self.closed:
+            return
+        self._buffer += str(text).replace("\n", " ").replace("```", "")
+        while True:
+            match = _SEGMENT_BREAK.search(self._buffer)
+            if not match:
+                break
+            if match.group().startswith("["):
+                self._emit(self._buffer[:match.start()])
+                self._emit(match.group())
+            else:
+                self._emit(self._buffer[:match.end()])
+            self._buffer = self._buffer[match.end():]
+
+    def close(self):
+        if self.closed:
+            return
+        self._emit(self._buffer)
+        self._buffer = ""
+        self.closed = True
+        self._segments.put(None)
+
+    def next_segment(self):
+        """Deferred firing with the next segment, or None once the stream is closed."""
+        return self._segments.get()
+
+    def _emit(self, part):
+        part = " ".join(part.split())
+        if part:
+            self.emitted += 1
+            self._segments.put(part)
+
+
+# One sentence and the gestures that start with it
+ScriptStep = namedtuple("ScriptStep", ["text", "gestures"])
+# Everything speak_with_gestures needs, so a script is only parsed once
+ScriptPlan = namedtuple("ScriptPlan", ["steps", "trailing"])
+
+_TAG = re.compile(r"(\[[A-Za-z_ ]+\])")
+
+
+@lru_cache(maxsize=1024)
+def clean_speech(part):
+    """Text as it can be sent to the speech engine, or "" if nothing is left to say."""
+    clean_part = re.sub(r"\[[^\]]*\]", " ", part)
+    # Remove problematic characters
+    clean_part = clean_part.replace('"', '').replace("'", '').replace('`', '')
+    clean_part = " ".join(clean_part.split())
+    # Skip empty or too short text
+    if len(clean_part) < 2:
+        return ""
+    return clean_part
+
+
+@lru_cache(maxsize=256)
+def tag_gesture(tag):
+    """Gesture for a [TAG], or None if no gesture of that name exists."""
+    key = tag[1:-1].strip().upper().replace(" ", "_")
+    key = re.sub(r"[^A-Z_]", "", key)
+    key = GESTURE_MAP.get(key, key)
+    if key not in GESTURES:
+        print(f"[TTS] Unknown gesture tag {tag} skipped")
+        return None
+    return key
+
+
+def _is_tag(part):
+    return part.startswith("[") and part.endswith("]")
+
+
+@lru_cache(maxsize=256)
+def compile_script(script):
+    """Turn a script with [GESTURE] tags into a ScriptPlan.
+
+    Plans are cached by script text, so a hint that is spoken again (from the
+    hint cache, the store or a replay) is not parsed a second time.
+    """
+    steps = []
+    lead = []
+    for part in _TAG.split(script.replace("\n", " ")):
         part = part.strip()
         if not part:
             continue
-        if part.startswith("[") and part.endswith("]"):
-            key = part[1:-1].strip().upper().replace(" ", "_")
-            key = re.sub(r"[^A-Z_]", "", key)
-            if key in gesture_map:
-                yield play_gesture(session, gesture_map[key])
-                yield sleep(0.3)
-        else:
-            clean_part = re.sub(r"\[[^\]]*\]", " ", part)
-            clean_part = " ".join(clean_part.split())
-            # Remove problematic characters
-            clean_part = clean_part.replace('"', '').replace("'", '').replace('`', '')
-            clean_part = clean_part.strip()
-            
-            # Skip empty or too short text
-            if len(clean_part) < 2:
-                continue
-            
-            print(f"[TTS] {clean_part}")
-            try:
-                yield session.call("rie.dialogue.say", text=clean_part)
-            except Exception as exc:
-                print(f"[TTS] Failed to speak: {exc}")
-            
-            # Occasionally add subtle idle gestures (20% chance)
-            if random.random() < 0.2:
-                yield play_idle(session)
-            
-            # Much shorter pause between sentences
-            pause = min(0.5, max(0.1, len(part) * 0.02))
-            yield sleep(pause)
+        if _is_tag(part):
+            key = tag_gesture(part)
+            if key:
+                lead.append(key)
+            continue
+        text = clean_speech(part)
+        if text:
+            steps.append(ScriptStep(text, tuple(lead)))
+            lead = []
+    return ScriptPlan(tuple(steps), tuple(lead))
+
+
+@inlineCallbacks
+def _speak_text(session, text, barge_in=None):
+    print(f"[TTS] {text}")
+    timeline = gesture_timeline(session)
+    # Occasionally add a subtle idle gesture, only while nothing else moves
+    if not timeline.busy() and random.random() < IDLE_GESTURE_CHANCE:
+        timeline.at(session, random.choice(IDLE_GESTURES), barge_in=barge_in, idle=True)
+    yield _interruptible(_say(session, text), barge_in)
+    if barge_in is not None and barge_in.fired:
+        yield _stop_speaking(session)
+        return
+    yield sleep(SENTENCE_PAUSE)
+
+
+@inlineCallbacks
+def speak_with_gestures(session, script, barge_in=None):
+    """Speak a script with [GESTURE] tags; stops early if barge_in fires.
+
+    Gestures play while the robot talks: a tag starts with the sentence after
+    it, and tags after the last sentence are timed to end together with it.
+    """
+    steps, trailing = compile_script(str(script))
+    timeline = gesture_timeline(session)
+    if not steps:
+        for key in trailing:
+            timeline.at(session, key, barge_in=barge_in)
+        return
+    for index, (text, lead) in enumerate(steps):
+        if barge_in is not None and barge_in.fired:
+            print("[TTS] Interrupted by the player")
+            return
+        for key in lead:
+            timeline.at(session, key, barge_in=barge_in)
+        if index == len(steps) - 1 and trailing:
+            spare = speech_log(session).estimate(text) - sum(map(gesture_duration, trailing))
+            for key in trailing:
+                timeline.at(session, key, delay=max(0.0, spare), barge_in=barge_in)
+        yield _speak_text(session, text, barge_in)
+
+
+@inlineCallbacks
+def speak_stream(session, stream, barge_in=None):
+    """Speak a ScriptStream segment by segment until it is closed or barge_in fires."""
+    while True:
+        part = yield _interruptible(stream.next_segment(), barge_in)
+        if barge_in is not None and barge_in.fired:
+            print("[TTS] Interrupted by the player")
+            return
+        if part is None:
+            return
+        if _is_tag(part):
+            # The next sentence follows right away, so the gesture goes with it
+            key = tag_gesture(part)
+            if key:
+                gesture_timeline(session).at(session, key, barge_in=barge_in)
+            continue
+        text = clean_speech(part)
+        if text:
+            yield _speak_text(session, text, barge_in)
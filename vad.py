@@ -0,0 +1,100 @@
+import numpy as np
+
+SAMPLE_RATE = 16000  # Hearing stream: 16 kHz, 16-bit mono PCM
+VAD_WINDOW = 320  # Samples per energy window (20 ms)
+VAD_SPEECH_RATIO = 3.0  # Speech is this many times louder than the noise floor
+VAD_MIN_THRESHOLD = 150
+VAD_MAX_THRESHOLD = 2000
+VAD_FLOOR_ADAPT = 0.05  # How fast the noise floor follows the room
+# End-of-utterance pause: short answers end quickly, longer ones may pause more
+VAD_MIN_HANGOVER = 0.35
+VAD_HANGOVER_PER_SECOND = 0.25
+VAD_MIN_SPEECH = 0.1  # Voiced time needed before a pause ends an utterance (skips clicks)
+
+
+def frame_pcm(frame):
+    """Raw PCM bytes of a rom.sensor.hearing.stream frame, or None."""
+    if not isinstance(frame, dict):
+        return None
+    data = frame.get("data")
+    if not isinstance(data, dict):
+        return None
+    audio = data.get("body.head")
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        return audio
+    return None
+
+
+class AdaptiveVAD:
+    """Energy-based voice activity detector with a self-calibrating noise floor.
+
+    Each frame is cut into fixed windows and their RMS energy is computed in one
+    NumPy pass. The noise floor follows the quiet windows while nobody speaks.
+    The silence needed to end an utterance grows with how long the speaker has
+    talked, so "yes" ends after a fraction of a second and only long hints get
+    close to `max_hangover`. The utterance ends once the trailing quiet windows
+    add up to the hangover; utterance_ended() reports that. A click shorter than
+    VAD_MIN_SPEECH followed by that much quiet is forgotten again.
+    """
+
+    def __init__(self, max_hangover, fallback_threshold):
+        self.max_hangover = max_hangover
+        self.noise_floor = None
+        self.threshold = fallback_threshold
+        self.speech_time = 0.0
+        self.silence = 0.0  # Quiet time since the last voiced window
+        self.hangover = max_hangover
+
+    def process(self, pcm):
+        """Update the detector with one frame of 16-bit PCM."""
+        samples = np.frombuffer(pcm, dtype=np.int16)
+        usable = len(samples) - len(samples) % VAD_WINDOW
+        if not usable:
+            return
+        windows = samples[:usable].reshape(-1, VAD_WINDOW).astype(np.float32)
+        energy = np.sqrt(np.mean(windows * windows, axis=1))
+
+        quiet = float(np.percentile(energy, 20))
+        if self.noise_floor is None:
+            self.noise_floor = quiet
+            self._update_threshold()
+        voiced_windows = energy > self.threshold
+        voiced = int(np.count_nonzero(voiced_windows))
+        window_time = VAD_WINDOW / SAMPLE_RATE
+        if voiced:
+            trailing = int(np.argmax(voiced_windows[::-1]))
+            self.silence = trailing * window_time
+        else:
+            self.silence += len(energy) * window_time
+        # Follow the room quickly while nobody talks, slowly during speech so a
+        # fan that switches on still gets absorbed into the floor eventually
+        rate = VAD_FLOOR_ADAPT
+        if voiced or self.speech_time > 0.0:
+            rate /= 5
+        self.noise_floor += rate * (quiet - self.noise_floor)
+        self._update_threshold()
+
+        self.speech_time += voiced * window_time
+        self.hangover = min(
+            self.max_hangover,
+            VAD_MIN_HANGOVER + VAD_HANGOVER_PER_SECOND * self.speech_time,
+        )
+        if self.speech_time < VAD_MIN_SPEECH and self.silence >= self.hangover:
+            # A click followed by a full pause was never the start of speech
+            self.speech_time = 0.0
+
+    def _update_threshold(self):
+        self.threshold = float(np.clip(
+            self.noise_floor * VAD_SPEECH_RATIO, VAD_MIN_THRESHOLD, VAD_MAX_THRESHOLD
+        ))
+
+    def in_speech(self):
+        return self.speech_time > 0.0
+
+    def utterance_ended(self):
+        return self.speech_time >= VAD_MIN_SPEECH and self.silence >= self.hangover
+
+    def end_utterance(self):
+        self.speech_time = 0.0
+        self.silence = 0.0
+        self.hangover = self.max_hangover